@@ -0,0 +1,179 @@
+import argparse
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from dataclasses import dataclass, field
+import os
+from pathlib import Path
+import sys
+import traceback
+from typing import Dict, List, Set, Tuple
+
+from common.structs import DatasetMetadata
+
+from .stages import DEFAULT_STAGES, STAGES, run_stage
+
+Task = Tuple[Path, str]  # (dataset folder, stage)
+
+
+@dataclass
+class BuildGraph:
+    tasks: List[Task]
+    waiting_on: Dict[Task, Set[Task]] = field(default_factory=dict)
+    """Unfinished tasks each task depends on."""
+
+    dependents: Dict[Task, List[Task]] = field(default_factory=dict)
+
+
+def discover_datasets(data_folder: Path) -> List[DatasetMetadata]:
+    return [
+        DatasetMetadata.from_file(path)
+        for path in sorted(data_folder.glob("**/dataset.json"))
+    ]
+
+
+def build_graph(datasets: List[DatasetMetadata], stages: List[str]) -> BuildGraph:
+    """
+    A task for every stage each dataset has the inputs for. Tasks depend on the
+    earlier stages of the same dataset; different datasets never depend on each other.
+    """
+    graph = BuildGraph(tasks=[])
+    for dataset in datasets:
+        for stage in stages:
+            if not STAGES[stage].applies(dataset):
+                continue
+            task = (dataset.folder, stage)
+            graph.tasks.append(task)
+            graph.waiting_on[task] = set()
+            graph.dependents[task] = []
+            for before in STAGES[stage].after:
+                dependency = (dataset.folder, before)
+                if dependency in graph.waiting_on:
+                    graph.waiting_on[task].add(dependency)
+                    graph.dependents[dependency].append(task)
+    return graph
+
+
+def run_graph(graph: BuildGraph, jobs: int) -> Dict[Task, str]:
+    """
+    Run every task once its dependencies are done, with up to `jobs` processes in
+    total. Datasets share the budget: each task may use `jobs // datasets` processes
+    of its own, so the pool and the tasks' own pools never oversubscribe the machine.
+
+    Returns the outcome of each task: "done", "failed" or "skipped" (a dependency
+    failed).
+    """
+    datasets = {folder for folder, _ in graph.tasks}
+    workers = max(1, min(jobs, len(datasets)))
+    jobs_per_task = max(1, jobs // workers)
+
+    outcomes: Dict[Task, str] = {}
+    waiting_on = {task: set(deps) for task, deps in graph.waiting_on.items()}
+    ready = [task for task in graph.tasks if not waiting_on[task]]
+    running: Dict[Future, Task] = {}
+    running_serial: Set[str] = set()
+
+    def skip_dependents(task: Task):
+        for dependent in graph.dependents[task]:
+            if dependent not in outcomes:
+                outcomes[dependent] = "skipped"
+                skip_dependents(dependent)
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        while ready or running:
+            for task in list(ready):
+                folder, stage = task
+                if len(running) >= workers:
+                    break
+                if STAGES[stage].serial:
+                    if stage in running_serial:
+                        continue
+                    running_serial.add(stage)
+                ready.remove(task)
+                print(f"[{stage}] {folder}")
+                future = executor.submit(run_stage, stage, folder, jobs_per_task)
+                running[future] = task
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                task = running.pop(future)
+                folder, stage = task
+                running_serial.discard(stage)
+                try:
+                    future.result()
+                except Exception:
+                    print(f"[{stage}] {folder} failed:", file=sys.stderr)
+                    traceback.print_exc()
+                    outcomes[task] = "failed"
+                    skip_dependents(task)
+                    continue
+
+                outcomes[task] = "done"
+                for dependent in graph.dependents[task]:
+                    waiting_on[dependent].discard(task)
+                    if not waiting_on[dependent] and dependent not in outcomes:
+                        ready.append(dependent)
+
+    return outcomes
+
+
+def main(data_folder: Path, stages: List[str], jobs: int, dry_run: bool):
+    datasets = discover_datasets(data_folder)
+    # keep the stages in dependency order whatever order they were given in
+    stages = [stage for stage in STAGES if stage in stages]
+    graph = build_graph(datasets, stages)
+
+    if dry_run:
+        for folder, stage in graph.tasks:
+            after = ", ".join(s for _, s in sorted(graph.waiting_on[(folder, stage)]))
+            print(f"[{stage}] {folder}" + (f" (after {after})" if after else ""))
+        return
+
+    outcomes = run_graph(graph, jobs)
+    failed = [task for task, outcome in outcomes.items() if outcome != "done"]
+    print(
+        f"{len(outcomes) - len(failed)} of {len(graph.tasks)} tasks done"
+        + (f", {len(failed)} failed or skipped" if failed else "")
+    )
+    for folder, stage in failed:
+        print(f"  [{stage}] {folder}: {outcomes[(folder, stage)]}")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        "batch", description="Run build stages for every dataset in the data folder"
+    )
+    parser.add_argument(
+        "data_folder",
+        type=str,
+        nargs="?",
+        default="data",
+        help="Folder to search for dataset.json files (default: data).",
+    )
+    parser.add_argument(
+        "--stages",
+        nargs="+",
+        choices=list(STAGES),
+        default=DEFAULT_STAGES,
+        help=f"Stages to run (default: {' '.join(DEFAULT_STAGES)}).",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Total number of processes to use (default: number of CPUs).",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action=argparse.BooleanOptionalAction,
+        default=False,
+        help="Print the tasks that would run, and what each waits for.",
+    )
+
+    args = parser.parse_args()
+    main(
+        data_folder=Path(args.data_folder),
+        stages=args.stages,
+        jobs=args.jobs,
+        dry_run=args.dry_run,
+    )
@@ -0,0 +1,114 @@
+"""
+The build stages the batch runner knows about, and how they depend on each other.
+"""
+from dataclasses import dataclass, field
+import os
+from pathlib import Path
+from typing import Callable, Dict, List
+
+from common.structs import CardsBuilder, DatasetMetadata
+
+
+def _has_annotations(dataset: DatasetMetadata) -> bool:
+    return dataset.annotations.exists() and dataset.audio_source.exists()
+
+
+def _has_terms(dataset: DatasetMetadata) -> bool:
+    return dataset.terms.exists()
+
+
+def _exports_terms(dataset: DatasetMetadata) -> bool:
+    return dataset.cards_builder == CardsBuilder.TERMS and _has_terms(dataset)
+
+
+def _has_exported_cards(dataset: DatasetMetadata) -> bool:
+    # cards built by kanoheda already have their English audio
+    return dataset.cards_builder == CardsBuilder.TERMS and (
+        dataset.terms.exists() or dataset.cards_json.exists()
+    )
+
+
+def _builds_lesson(dataset: DatasetMetadata) -> bool:
+    return (
+        dataset.cards_builder == CardsBuilder.KANOHEDA
+        and _has_annotations(dataset)
+        and _has_terms(dataset)
+    )
+
+
+def split_audio(dataset: DatasetMetadata, jobs: int):
+    from match_audio.matching import get_matchable_audio_from_annotations
+
+    os.makedirs(dataset.audio_output_dir, exist_ok=True)
+    get_matchable_audio_from_annotations(dataset, jobs=jobs)
+
+
+def auto_match(dataset: DatasetMetadata, jobs: int):
+    from match_audio.__main__ import auto_match_segments_and_extract_audio
+
+    auto_match_segments_and_extract_audio(dataset, jobs=jobs)
+
+
+def export_json(dataset: DatasetMetadata, jobs: int):
+    from common.online_exercises_structs import export_terms_to_json
+
+    export_terms_to_json(dataset)
+
+
+def english_audio(dataset: DatasetMetadata, jobs: int):
+    from generate_english_audio.generate_english_audio_for_deck import main
+
+    main(dataset)
+
+
+def kanoheda(dataset: DatasetMetadata, jobs: int):
+    from kanoheda.__main__ import main
+
+    main(dataset.folder, jobs=jobs)
+
+
+@dataclass
+class Stage:
+    run: Callable[[DatasetMetadata, int], None]
+    applies: Callable[[DatasetMetadata], bool]
+    """Whether the dataset has the inputs this stage needs."""
+
+    after: List[str] = field(default_factory=list)
+    """Stages that must finish first for the same dataset, if they're being run."""
+
+    serial: bool = False
+    """Only one dataset runs this stage at a time (it writes to shared files)."""
+
+
+STAGES: Dict[str, Stage] = {
+    "split_audio": Stage(split_audio, applies=_has_annotations),
+    "auto_match": Stage(
+        auto_match,
+        applies=lambda d: _has_annotations(d) and _exports_terms(d),
+        after=["split_audio"],
+    ),
+    "export_json": Stage(export_json, applies=_exports_terms, after=["auto_match"]),
+    # English TTS shares the clip cache in cache/en between datasets
+    "english_audio": Stage(
+        english_audio,
+        applies=_has_exported_cards,
+        after=["export_json"],
+        serial=True,
+    ),
+    # every lesson is rendered to the same LESSON_AUDIO file
+    "kanoheda": Stage(
+        kanoheda,
+        applies=_builds_lesson,
+        after=["split_audio"],
+        serial=True,
+    ),
+}
+
+DEFAULT_STAGES = ["split_audio", "export_json", "english_audio", "kanoheda"]
+"""Stages that run without anyone reviewing the results (auto_match rewrites terms CSVs)."""
+
+
+def run_stage(stage: str, dataset_folder: Path, jobs: int):
+    """Entry point for worker processes."""
+    dataset = DatasetMetadata.from_file(dataset_folder / "dataset.json")
+    STAGES[stage].run(dataset, jobs)
@@ -1,18 +1,219 @@
 """
-Python module for interfacing with an annotation TSV file from ELAN (ie. the TSV referenced by `DatasetMetadata.annotations`)
+Python module for interfacing with ELAN annotations (ie. the TSV export or EAF file referenced by `DatasetMetadata.annotations`)
 """
 
 
+from array import array
+import audioop
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+import csv
 from csv import DictReader
 from dataclasses import dataclass
 import itertools
+import math
+import mmap
 from pathlib import Path
-from typing import Generator, Iterable, Tuple, TypeVar
+import re
+import struct
+import sys
+from tempfile import TemporaryDirectory
+from xml.etree.ElementTree import iterparse
+from typing import (
+    Dict,
+    Generator,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    TypeVar,
+)
 
+from common.encoding import export_batch
+from common.normalization import normalize_batch
+from common.split_audio_cache import (
+    SPLIT_AUDIO_EXPORT_PARAMETERS,
+    SPLIT_AUDIO_FORMAT,
+    SPLIT_AUDIO_HEADROOM,
+    SPLIT_AUDIO_NORMALIZATION,
+    SplitAudioCache,
+)
 from common.structs import AnnotationFormat, DatasetMetadata
 
+import numpy as np
 from pydub import AudioSegment
-from pydub.effects import normalize
+
+
+class AudioSourceReader:
+    """
+    Reads the audio for individual annotations out of a source recording (ie. the
+    file referenced by `DatasetMetadata.audio_source`).
+    """
+
+    def segment(self, start_ms: int, end_ms: int) -> AudioSegment:
+        """Audio between `start_ms` and `end_ms`, sliced the same way as `AudioSegment`."""
+        raise NotImplementedError()
+
+    @property
+    def duration_ms(self) -> int:
+        raise NotImplementedError()
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class DecodedSourceReader(AudioSourceReader):
+    """Decodes the whole recording up front. Used for formats we can't seek in (eg. MP3)."""
+
+    def __init__(self, path: Path):
+        self.audio: AudioSegment = AudioSegment.from_file(path)
+
+    def segment(self, start_ms: int, end_ms: int) -> AudioSegment:
+        return self.audio[start_ms:end_ms]  # type: ignore
+
+    @property
+    def duration_ms(self) -> int:
+        return len(self.audio)
+
+
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+
+class WavSourceReader(AudioSourceReader):
+    """
+    Memory-maps a PCM WAV file and only reads the frames each annotation needs, so
+    memory use depends on segment length rather than recording length.
+    """
+
+    def __init__(self, path: Path):
+        self._file = open(path, "rb")
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._parse_header()
+        except:
+            self.close()
+            raise
+
+    def _parse_header(self):
+        data = self._mmap
+        if len(data) < 12 or data[0:4] != b"RIFF" or data[8:12] != b"WAVE":
+            raise ValueError("Not a RIFF/WAVE file")
+
+        fmt = None
+        offset = 12
+        while offset + 8 <= len(data):
+            chunk_id = data[offset : offset + 4]
+            (chunk_size,) = struct.unpack("<I", data[offset + 4 : offset + 8])
+            body = offset + 8
+            if chunk_id == b"fmt ":
+                fmt = data[body : body + chunk_size]
+            elif chunk_id == b"data":
+                if fmt is None:
+                    raise ValueError("WAV data chunk found before fmt chunk")
+                # streamed/oversized files may have a bogus data size; trust the file length
+                self._data_start = body
+                self._data_end = min(body + chunk_size, len(data))
+                break
+            # chunks are word aligned
+            offset = body + chunk_size + (chunk_size % 2)
+        else:
+            raise ValueError("WAV file has no data chunk")
+
+        audio_format, channels, frame_rate, _, _, bits_per_sample = struct.unpack(
+            "<HHIIHH", fmt[:16]
+        )
+        if audio_format == WAVE_FORMAT_EXTENSIBLE and len(fmt) >= 26:
+            (audio_format,) = struct.unpack("<H", fmt[24:26])
+        if audio_format != WAVE_FORMAT_PCM:
+            raise ValueError(f"Unsupported WAV format: {audio_format:#x}")
+
+        self.channels: int = channels
+        self.frame_rate: int = frame_rate
+        self.sample_width: int = bits_per_sample // 8
+        self.frame_width: int = self.channels * self.sample_width
+        self.frame_count: int = (self._data_end - self._data_start) // self.frame_width
+
+    @property
+    def duration_ms(self) -> int:
+        return round(1000 * self.frame_count / self.frame_rate)
+
+    def _frame_at(self, ms: int) -> int:
+        return int(min(ms, self.duration_ms) * self.frame_rate / 1000.0)
+
+    def segment(self, start_ms: int, end_ms: int) -> AudioSegment:
+        start_frame = self._frame_at(start_ms)
+        end_frame = max(start_frame, self._frame_at(end_ms))
+        data = self._mmap[
+            self._data_start
+            + min(start_frame, self.frame_count) * self.frame_width : self._data_start
+            + min(end_frame, self.frame_count) * self.frame_width
+        ]
+        if self.sample_width == 1:
+            # convert from unsigned integers in wav
+            data = audioop.bias(data, 1, -128)
+
+        # like AudioSegment, pad rounding errors at the end of the recording with silence
+        missing_frames = end_frame - start_frame - len(data) // self.frame_width
+        if missing_frames:
+            data += b"\x00" * (missing_frames * self.frame_width)
+
+        return AudioSegment(
+            data,
+            # AudioSegment widens 24-bit audio to 32-bit, but can't do so for empty data
+            sample_width=self.sample_width if data or self.sample_width != 3 else 4,
+            frame_rate=self.frame_rate,
+            channels=self.channels,
+        )
+
+    def close(self):
+        if getattr(self, "_mmap", None) is not None:
+            self._mmap.close()
+            self._mmap = None
+        self._file.close()
+
+
+def open_audio_source(path: Path) -> AudioSourceReader:
+    """
+    Open a source recording for reading annotation audio. PCM WAV files are read
+    lazily; anything else is decoded in full.
+    """
+    if path.suffix.lower() == ".wav":
+        try:
+            return WavSourceReader(path)
+        except ValueError:
+            pass
+    return DecodedSourceReader(path)
+
+
+@contextmanager
+def mappable_audio_source(path: Path) -> Iterator[Path]:
+    """
+    A PCM WAV file with the audio of `path`, for worker processes to each memory-map.
+    Anything else is decoded once, into a temporary WAV file removed on exit, rather
+    than in full by every worker.
+    """
+    if path.suffix.lower() == ".wav":
+        try:
+            WavSourceReader(path).close()
+        except ValueError:
+            pass
+        else:
+            yield path
+            return
+
+    with TemporaryDirectory() as tmp_dir:
+        wav_path = Path(tmp_dir) / "source.wav"
+        DecodedSourceReader(path).audio.export(wav_path, format="wav")
+        yield wav_path
 
 
 @dataclass
@@ -23,22 +224,153 @@ class Annotation:
     duration_ms: int
     annotation_text: str
 
-    def split_audio_path(self, dataset: DatasetMetadata):
-        """Path to file containing the audio for just this annotation."""
-        return (
-            dataset.audio_output_dir / f"split_audio_{self.start_ms}_{self.end_ms}.mp3"
-        )
-
-    def ensure_split_audio_exists(
-        self, dataset: DatasetMetadata, audio_source: AudioSegment
+    def split_audio_path(
+        self, dataset: DatasetMetadata, audio_source_path: Optional[Path] = None
     ):
-        """Ensure that a file with just the annotated audio exists on disk."""
-        split_audio_path = self.split_audio_path(dataset)
-        if not split_audio_path.exists():
-            cherokee_audio: AudioSegment = normalize(audio_source[self.start_ms : self.end_ms])  # type: ignore
-            cherokee_audio.export(
-                split_audio_path, format="mp3", parameters=["-qscale:a", "0"]
-            )
+        """
+        Path to file containing the audio for just this annotation.
+
+        Audio cut from a source other than `dataset.audio_source` (eg. the English
+        recording) is prefixed with that source's name so the two can't collide.
+        """
+        if audio_source_path is None or audio_source_path == dataset.audio_source:
+            prefix = "split_audio"
+        else:
+            source_name = re.sub(r"[^0-9a-zA-Z]+", "_", audio_source_path.stem)
+            prefix = f"split_audio_{source_name}"
+        return dataset.audio_output_dir / f"{prefix}_{self.start_ms}_{self.end_ms}.mp3"
+
+
+def write_split_audio(
+    annotations: Sequence[Annotation],
+    split_audio_paths: Sequence[Path],
+    audio_source: AudioSourceReader,
+):
+    """
+    Write files with just the annotated audio, replacing any existing files. The
+    annotations are normalized together in one vectorized pass and encoded by a
+    single ffmpeg process.
+    """
+    split_audio = normalize_batch(
+        [
+            audio_source.segment(annotation.start_ms, annotation.end_ms)
+            for annotation in annotations
+        ],
+        mode=SPLIT_AUDIO_NORMALIZATION,
+        headroom=SPLIT_AUDIO_HEADROOM,
+    )
+    export_batch(
+        split_audio,
+        split_audio_paths,
+        format=SPLIT_AUDIO_FORMAT,
+        parameters=SPLIT_AUDIO_EXPORT_PARAMETERS,
+    )
+
+
+SPLIT_AUDIO_BATCH_SIZE = 32
+"""Most annotations handed to a worker process (and so one ffmpeg process) at once."""
+
+_worker_audio_source: Optional[AudioSourceReader] = None
+
+
+def _init_split_audio_worker(audio_source_path: Path):
+    """Open the source recording once per worker process."""
+    global _worker_audio_source
+    _worker_audio_source = open_audio_source(audio_source_path)
+
+
+def _write_split_audio_in_worker(
+    annotations: List[Annotation], split_audio_paths: List[Path]
+) -> List[Path]:
+    assert _worker_audio_source is not None, "Worker was not initialized"
+    write_split_audio(annotations, split_audio_paths, _worker_audio_source)
+    return split_audio_paths
+
+
+def ensure_split_audio_exists_for_annotations(
+    dataset: DatasetMetadata,
+    annotations: Iterable[Annotation],
+    audio_source_path: Optional[Path] = None,
+    jobs: int = 1,
+) -> List[Path]:
+    """
+    Ensure up to date split audio exists for every annotation, spreading slicing,
+    normalization and encoding over `jobs` worker processes.
+
+    Files are only rebuilt when they are missing or `SplitAudioCache` says they are
+    stale. The cache is saved after every batch, so an interrupted run keeps what it
+    finished. Returns the split audio path for each annotation, in the order given.
+    """
+    annotations = list(annotations)
+    if audio_source_path is None:
+        audio_source_path = dataset.audio_source
+
+    cache = SplitAudioCache.for_dataset(dataset)
+    source_digest = cache.source_digest(audio_source_path)
+
+    split_audio_paths = []
+    # only extract each stale file once, even if annotations share a time range
+    stale: Dict[Path, Tuple[Annotation, str]] = {}
+    for annotation in annotations:
+        split_audio_path = annotation.split_audio_path(dataset, audio_source_path)
+        split_audio_paths.append(split_audio_path)
+        key = cache.key(source_digest, annotation.start_ms, annotation.end_ms)
+        if not cache.is_fresh(split_audio_path, key):
+            stale.setdefault(split_audio_path, (annotation, key))
+
+    stale_paths = list(stale.keys())
+    batch_size = max(
+        1, min(SPLIT_AUDIO_BATCH_SIZE, math.ceil(len(stale_paths) / max(1, jobs)))
+    )
+    batches = [
+        stale_paths[i : i + batch_size] for i in range(0, len(stale_paths), batch_size)
+    ]
+
+    # from here on, files without an entry may be half written by an interrupted run
+    cache.save()
+
+    if stale and jobs > 1:
+        with mappable_audio_source(audio_source_path) as wav_path, ProcessPoolExecutor(
+            max_workers=min(jobs, len(batches)),
+            initializer=_init_split_audio_worker,
+            initargs=(wav_path,),
+        ) as pool:
+            for written in pool.map(
+                _write_split_audio_in_worker,
+                [[stale[path][0] for path in batch] for batch in batches],
+                batches,
+            ):
+                for split_audio_path in written:
+                    cache.record(split_audio_path, stale[split_audio_path][1])
+                cache.save()
+    elif stale:
+        with open_audio_source(audio_source_path) as audio_source:
+            for batch in batches:
+                write_split_audio(
+                    [stale[path][0] for path in batch], batch, audio_source
+                )
+                for split_audio_path in batch:
+                    cache.record(split_audio_path, stale[split_audio_path][1])
+                cache.save()
+
+    return split_audio_paths
+
+
+def read_annotations(dataset: DatasetMetadata) -> Iterator[Annotation]:
+    return read_annotations_from_path(dataset.annotations, dataset.annotation_tier)
+
+
+def read_annotations_from_path(
+    path: Path, tier: Optional[str] = None
+) -> Iterator[Annotation]:
+    """Read annotations from an ELAN EAF file or TSV export, optionally from one tier."""
+    if path.suffix.lower() == ".eaf":
+        return read_annotations_eaf_from_path(path, tier)
+
+    annotations = read_annotations_tsv_from_path(path)
+    if tier is None:
+        return annotations
+    return (annotation for annotation in annotations if annotation.tier == tier)
 
 
 def read_annotations_tsv(dataset: DatasetMetadata):
@@ -61,31 +393,281 @@ def read_annotations_tsv_from_path(path: Path):
             )
 
 
-def cherokee_annotations(dataset: DatasetMetadata) -> Generator[Annotation, None, None]:
+def write_annotations_tsv(path: Path, annotations: Iterable[Annotation]):
+    """Write annotations in the same layout as an ELAN TSV export."""
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f, delimiter="\t", lineterminator="\n")
+        for annotation in annotations:
+            writer.writerow(
+                [
+                    annotation.tier,
+                    "",
+                    annotation.start_ms,
+                    annotation.end_ms,
+                    annotation.duration_ms,
+                    annotation.annotation_text,
+                ]
+            )
+
+
+def _resolve_unaligned_time_slots(
+    time_slot_ids: List[str], time_slots: Dict[str, Optional[int]]
+):
+    """Spread unaligned time slots evenly between their aligned neighbours."""
+    aligned = [
+        i for i, slot_id in enumerate(time_slot_ids) if time_slots[slot_id] is not None
+    ]
+    if not aligned:
+        return
+
+    for before, after in zip(aligned, aligned[1:]):
+        start: int = time_slots[time_slot_ids[before]]  # type: ignore
+        end: int = time_slots[time_slot_ids[after]]  # type: ignore
+        for i in range(before + 1, after):
+            time_slots[time_slot_ids[i]] = round(
+                start + (end - start) * (i - before) / (after - before)
+            )
+
+    # slots outside the aligned range take the nearest aligned time
+    for i in range(aligned[0]):
+        time_slots[time_slot_ids[i]] = time_slots[time_slot_ids[aligned[0]]]
+    for i in range(aligned[-1] + 1, len(time_slot_ids)):
+        time_slots[time_slot_ids[i]] = time_slots[time_slot_ids[aligned[-1]]]
+
+
+def read_annotations_eaf_from_path(
+    path: Path, tier: Optional[str] = None
+) -> Iterator[Annotation]:
     """
-    Drop non-Cherokee annotations.
+    Stream annotations from an ELAN EAF file, in the same form as its TSV export.
+
+    TIME_ORDER comes before any tier, so time slots are indexed as they are read and
+    each annotation is resolved (and discarded) as soon as it has been parsed.
+    Symbolic annotations (REF_ANNOTATION) take the times of the annotation they refer to.
     """
-    annotations = read_annotations_tsv(dataset)
+    time_slot_ids: List[str] = []
+    time_slots: Dict[str, Optional[int]] = {}
+    # annotation id -> (start_ms, end_ms), for resolving REF_ANNOTATIONs
+    annotation_times: Dict[str, Tuple[int, int]] = {}
+    current_tier = None
 
-    if dataset.annotation_format == AnnotationFormat.ENGLISH_CHEROKEE_ALTERNATING:
-        """
-        Drop every other annotation (assumes annotations alternate between English and Cherokee, starting with English).
+    for event, element in iterparse(path, events=("start", "end")):
+        if event == "start":
+            if element.tag == "TIER":
+                current_tier = element.get("TIER_ID")
+            continue
 
-        This is ugly and we should just stop annotating the English.
-        """
-        for annotation in itertools.islice(annotations, 1, None, 2):
-            yield annotation
+        if element.tag == "TIME_SLOT":
+            slot_id = element.get("TIME_SLOT_ID", "")
+            time_value = element.get("TIME_VALUE")
+            time_slot_ids.append(slot_id)
+            time_slots[slot_id] = None if time_value is None else int(time_value)
+            element.clear()
 
-    elif dataset.annotation_format == AnnotationFormat.CHEROKEE_NONEMPTY:
-        """
-        Drop empty annotations
-        """
-        yield from (
-            annotation
-            for annotation in annotations
-            if not annotation.annotation_text.strip() == ""
+        elif element.tag == "TIME_ORDER":
+            _resolve_unaligned_time_slots(time_slot_ids, time_slots)
+            element.clear()
+
+        elif element.tag in ("ALIGNABLE_ANNOTATION", "REF_ANNOTATION"):
+            if element.tag == "ALIGNABLE_ANNOTATION":
+                start_ms = time_slots[element.get("TIME_SLOT_REF1", "")]
+                end_ms = time_slots[element.get("TIME_SLOT_REF2", "")]
+            else:
+                start_ms, end_ms = annotation_times[element.get("ANNOTATION_REF", "")]
+            annotation_times[element.get("ANNOTATION_ID", "")] = (start_ms, end_ms)  # type: ignore
+
+            if tier is None or current_tier == tier:
+                yield Annotation(
+                    tier=current_tier or "",
+                    start_ms=start_ms,  # type: ignore
+                    end_ms=end_ms,  # type: ignore
+                    duration_ms=end_ms - start_ms,  # type: ignore
+                    annotation_text=element.findtext("ANNOTATION_VALUE") or "",
+                )
+
+        elif element.tag in ("ANNOTATION", "TIER"):
+            element.clear()
+
+
+class AnnotationTable:
+    """
+    Column-oriented store for large sets of annotations.
+
+    Times are kept in NumPy int arrays, tiers as codes into a short list of tier names
+    and text as codes into a list of unique (interned) strings. Filtering and slicing
+    work on whole columns; indexing and iteration yield `Annotation`s.
+    """
+
+    def __init__(
+        self,
+        tiers: List[str],
+        tier_codes: np.ndarray,
+        start_ms: np.ndarray,
+        end_ms: np.ndarray,
+        duration_ms: np.ndarray,
+        texts: List[str],
+        text_codes: np.ndarray,
+    ):
+        self.tiers = tiers
+        self.tier_codes = tier_codes
+        self.start_ms = start_ms
+        self.end_ms = end_ms
+        self.duration_ms = duration_ms
+        self.texts = texts
+        self.text_codes = text_codes
+        self._first_row_by_text: Optional[Dict[str, int]] = None
+
+    @staticmethod
+    def from_rows(rows: Iterable[Tuple[str, int, int, int, str]]) -> "AnnotationTable":
+        """Build a table from (tier, start_ms, end_ms, duration_ms, text) rows."""
+        tier_index: Dict[str, int] = {}
+        text_index: Dict[str, int] = {}
+        # compact buffers so building a big table doesn't need a Python int per cell
+        tier_codes = array("i")
+        start_ms = array("q")
+        end_ms = array("q")
+        duration_ms = array("q")
+        text_codes = array("i")
+        for tier, start, end, duration, text in rows:
+            tier_codes.append(tier_index.setdefault(tier, len(tier_index)))
+            start_ms.append(start)
+            end_ms.append(end)
+            duration_ms.append(duration)
+            text_codes.append(text_index.setdefault(sys.intern(text), len(text_index)))
+
+        return AnnotationTable(
+            tiers=list(tier_index),
+            tier_codes=np.frombuffer(tier_codes, dtype=np.int32),
+            start_ms=np.frombuffer(start_ms, dtype=np.int64),
+            end_ms=np.frombuffer(end_ms, dtype=np.int64),
+            duration_ms=np.frombuffer(duration_ms, dtype=np.int64),
+            texts=list(text_index),
+            text_codes=np.frombuffer(text_codes, dtype=np.int32),
+        )
+
+    @staticmethod
+    def from_annotations(annotations: Iterable[Annotation]) -> "AnnotationTable":
+        return AnnotationTable.from_rows(
+            (a.tier, a.start_ms, a.end_ms, a.duration_ms, a.annotation_text)
+            for a in annotations
+        )
+
+    @staticmethod
+    def from_tsv(path: Path) -> "AnnotationTable":
+        """Read an ELAN TSV export without building an `Annotation` per row."""
+        with open(path, newline="") as f:
+            return AnnotationTable.from_rows(
+                (row[0], int(row[2]), int(row[3]), int(row[4]), row[5])
+                for row in csv.reader(f, delimiter="\t")
+                if row
+            )
+
+    @staticmethod
+    def from_path(path: Path, tier: Optional[str] = None) -> "AnnotationTable":
+        """Read annotations from an ELAN EAF file or TSV export, optionally from one tier."""
+        if path.suffix.lower() == ".eaf":
+            return AnnotationTable.from_annotations(
+                read_annotations_eaf_from_path(path, tier)
+            )
+
+        table = AnnotationTable.from_tsv(path)
+        if tier is None:
+            return table
+        return table.filter(table.tier_mask(tier))
+
+    @staticmethod
+    def for_dataset(dataset: DatasetMetadata) -> "AnnotationTable":
+        return AnnotationTable.from_path(dataset.annotations, dataset.annotation_tier)
+
+    def __len__(self):
+        return len(self.start_ms)
+
+    def _annotation(self, i: int) -> Annotation:
+        return Annotation(
+            tier=self.tiers[self.tier_codes[i]],
+            start_ms=int(self.start_ms[i]),
+            end_ms=int(self.end_ms[i]),
+            duration_ms=int(self.duration_ms[i]),
+            annotation_text=self.texts[self.text_codes[i]],
+        )
+
+    def __getitem__(self, index):
+        """An `Annotation` for an integer index, otherwise a table of the selected rows."""
+        if isinstance(index, (int, np.integer)):
+            if index < 0:
+                index += len(self)
+            if not 0 <= index < len(self):
+                raise IndexError("annotation index out of range")
+            return self._annotation(int(index))
+        return self.filter(index)
+
+    def __iter__(self) -> Iterator[Annotation]:
+        return (self._annotation(i) for i in range(len(self)))
+
+    def filter(self, selection) -> "AnnotationTable":
+        """Rows picked by a boolean mask, index array or slice. Columns are shared where possible."""
+        return AnnotationTable(
+            tiers=self.tiers,
+            tier_codes=self.tier_codes[selection],
+            start_ms=self.start_ms[selection],
+            end_ms=self.end_ms[selection],
+            duration_ms=self.duration_ms[selection],
+            texts=self.texts,
+            text_codes=self.text_codes[selection],
         )
 
+    def tier_mask(self, tier: str) -> np.ndarray:
+        if tier not in self.tiers:
+            return np.zeros(len(self), dtype=bool)
+        return self.tier_codes == self.tiers.index(tier)
+
+    def nonempty_mask(self) -> np.ndarray:
+        """Rows whose text isn't just whitespace (only unique texts are checked)."""
+        nonempty_texts = np.array(
+            [text.strip() != "" for text in self.texts], dtype=bool
+        )
+        return nonempty_texts[self.text_codes]
+
+    def first_with_text(self, text: str) -> Optional[Annotation]:
+        """The first annotation whose text matches `text`, ignoring surrounding whitespace."""
+        if self._first_row_by_text is None:
+            # first row of each unique text, then merge texts that only differ by whitespace
+            codes, first_rows = np.unique(self.text_codes, return_index=True)
+            self._first_row_by_text = {}
+            for row, code in sorted(zip(first_rows.tolist(), codes.tolist())):
+                self._first_row_by_text.setdefault(self.texts[code].strip(), row)
+
+        row = self._first_row_by_text.get(text.strip())
+        return None if row is None else self._annotation(row)
+
+    def cherokee(self, annotation_format: AnnotationFormat) -> "AnnotationTable":
+        """Drop non-Cherokee annotations."""
+        if annotation_format == AnnotationFormat.ENGLISH_CHEROKEE_ALTERNATING:
+            """
+            Drop every other annotation (assumes annotations alternate between English and Cherokee, starting with English).
+
+            This is ugly and we should just stop annotating the English.
+            """
+            return self[1::2]
+
+        elif annotation_format == AnnotationFormat.CHEROKEE_NONEMPTY:
+            """
+            Drop empty annotations
+            """
+            return self.filter(self.nonempty_mask())
+
+        elif annotation_format == AnnotationFormat.ALL:
+            return self
+
+        raise ValueError(f"Unknown annotation format: {annotation_format}")
+
+
+def cherokee_annotations(dataset: DatasetMetadata) -> Generator[Annotation, None, None]:
+    """
+    Drop non-Cherokee annotations.
+    """
+    yield from AnnotationTable.for_dataset(dataset).cherokee(dataset.annotation_format)
+
 
 T = TypeVar("T")
 
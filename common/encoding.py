@@ -0,0 +1,75 @@
+"""
+Encode many `AudioSegment`s with a single ffmpeg process, instead of one per `AudioSegment.export`.
+"""
+from pathlib import Path
+import subprocess
+from tempfile import TemporaryDirectory
+from typing import List, Optional, Sequence
+
+from pydub import AudioSegment
+from pydub.exceptions import CouldntEncodeError
+
+RAW_SAMPLE_FORMATS = {1: "s8", 2: "s16le", 4: "s32le"}
+
+
+def export_batch(
+    segments: Sequence[AudioSegment],
+    out_paths: Sequence[Path],
+    format: str = "mp3",
+    parameters: Optional[List[str]] = None,
+):
+    """
+    Export each segment to the matching path with one ffmpeg invocation.
+
+    Every segment becomes its own raw PCM input mapped to its own output, so each file
+    is encoded independently and comes out the same as `segment.export(path, format,
+    parameters=parameters)` would have made it.
+    """
+    if len(segments) != len(out_paths):
+        raise ValueError("Expected one output path per segment")
+    if len(segments) == 0:
+        return
+
+    audio_params = {(s.sample_width, s.frame_rate, s.channels) for s in segments}
+    if len(audio_params) != 1:
+        raise ValueError(
+            "Segments in a batch must share sample width, rate and channels"
+        )
+    ((sample_width, frame_rate, channels),) = audio_params
+
+    with TemporaryDirectory() as tmp_dir:
+        conversion_command = [AudioSegment.converter, "-y"]
+        for i, segment in enumerate(segments):
+            raw_path = Path(tmp_dir) / f"{i}.raw"
+            raw_path.write_bytes(segment.raw_data)
+            conversion_command.extend(
+                [
+                    "-f",
+                    RAW_SAMPLE_FORMATS[sample_width],
+                    "-ar",
+                    str(frame_rate),
+                    "-ac",
+                    str(channels),
+                    "-i",
+                    str(raw_path),
+                ]
+            )
+
+        for i, out_path in enumerate(out_paths):
+            conversion_command.extend(["-map", f"{i}:a"])
+            conversion_command.extend(parameters or [])
+            conversion_command.extend(["-f", format, str(out_path)])
+
+        p = subprocess.run(
+            conversion_command,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+
+    if p.returncode != 0:
+        raise CouldntEncodeError(
+            "Encoding failed. ffmpeg/avlib returned error code: {0}\n\nCommand:{1}\n\nOutput from ffmpeg/avlib:\n\n{2}".format(
+                p.returncode, conversion_command, p.stderr.decode(errors="ignore")
+            )
+        )
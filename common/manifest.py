@@ -0,0 +1,116 @@
+"""
+Helpers for the small JSON manifests used to remember what has already been built.
+"""
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+from common.structs import DatasetMetadata
+
+
+def read_manifest(path: Path) -> Dict[str, Any]:
+    """Read a manifest, treating a missing or unreadable file as empty."""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def write_manifest(path: Path, data: Dict[str, Any]):
+    """Atomically replace a manifest so an interrupted run never leaves half a file."""
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, ensure_ascii=False, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def file_sha1(path: Path, chunk_size: int = 1 << 20) -> str:
+    sha1 = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            sha1.update(chunk)
+    return sha1.hexdigest()
+
+
+def file_fingerprint(path: Optional[Path]) -> Optional[List[int]]:
+    """Cheap stand-in for a file's content: its size and modification time."""
+    if path is None or not path.exists():
+        return None
+    stat = path.stat()
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def digest(*parts: Any) -> str:
+    """Stable hash of any JSON-serializable inputs."""
+    return hashlib.sha1(
+        json.dumps(parts, sort_keys=True, default=str, ensure_ascii=False).encode(
+            "UTF-8"
+        )
+    ).hexdigest()
+
+
+class BuildManifest:
+    """
+    Remembers what each pipeline stage built for a dataset, so a rerun only redoes
+    the work whose inputs changed.
+
+    Entries are grouped by stage and keyed within it (eg. one entry per card). Each
+    records a digest of its inputs, the files it produced and any data needed to
+    reuse the result. Files are recorded relative to `folder` (the dataset's), so
+    the manifest means the same wherever commands are run from.
+    """
+
+    def __init__(self, path: Path, folder: Path):
+        self.path = path
+        self.folder = folder
+        self.stages: Dict[str, Dict[str, Dict[str, Any]]] = read_manifest(path).get(
+            "stages", {}
+        )
+
+    @staticmethod
+    def for_dataset(dataset: DatasetMetadata) -> "BuildManifest":
+        return BuildManifest(dataset.build_manifest, dataset.folder)
+
+    def get(self, stage: str, key: str, inputs: str) -> Optional[Dict[str, Any]]:
+        """The entry for `key` if it was built from `inputs` and its outputs still exist."""
+        entry = self.stages.get(stage, {}).get(key)
+        if entry is None or entry["inputs"] != inputs:
+            return None
+        if not all((self.folder / output).exists() for output in entry["outputs"]):
+            return None
+        return entry
+
+    def is_current(self, stage: str, key: str, inputs: str) -> bool:
+        return self.get(stage, key, inputs) is not None
+
+    def record(
+        self,
+        stage: str,
+        key: str,
+        inputs: str,
+        outputs: Iterable[Union[str, Path]] = (),
+        data: Any = None,
+    ):
+        self.stages.setdefault(stage, {})[key] = {
+            "inputs": inputs,
+            "outputs": [
+                Path(os.path.relpath(output, self.folder)).as_posix()
+                for output in outputs
+            ],
+            "data": data,
+        }
+
+    def prune(self, stage: str, keys: Iterable[str]):
+        """Forget entries of `stage` that aren't in `keys`."""
+        keep = set(keys)
+        self.stages[stage] = {
+            key: entry
+            for key, entry in self.stages.get(stage, {}).items()
+            if key in keep
+        }
+
+    def save(self):
+        write_manifest(self.path, {"stages": self.stages})
@@ -0,0 +1,229 @@
+"""
+Vectorized normalization for `AudioSegment`s, working directly on NumPy sample arrays.
+
+Peak mode gives the same output as `pydub.effects.normalize`. Loudness mode targets an
+integrated loudness (ITU-R BS.1770, in LUFS) instead, without letting peaks clip.
+"""
+from enum import Enum
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+from pydub import AudioSegment
+
+
+class NormalizationMode(Enum):
+    PEAK = "PEAK"
+    """Boost so the loudest sample sits `headroom` dB below full scale."""
+
+    LOUDNESS = "LOUDNESS"
+    """Boost to an integrated loudness of `target_lufs`, limited so peaks keep `headroom`."""
+
+
+DEFAULT_HEADROOM = 0.1
+DEFAULT_TARGET_LUFS = -16.0
+
+SAMPLE_DTYPES = {1: np.int8, 2: np.int16, 4: np.int32}
+
+# BS.1770 gating
+BLOCK_SECONDS = 0.4
+BLOCK_OVERLAP = 0.75
+ABSOLUTE_GATE_LUFS = -70.0
+RELATIVE_GATE_LU = -10.0
+
+
+def samples_from_segment(segment: AudioSegment) -> np.ndarray:
+    """Interleaved samples of a segment, without copying."""
+    return np.frombuffer(segment.raw_data, dtype=SAMPLE_DTYPES[segment.sample_width])
+
+
+def segment_from_samples(samples: np.ndarray, like: AudioSegment) -> AudioSegment:
+    """A segment with the same sample width, frame rate and channels as `like`."""
+    return like._spawn(samples.astype(SAMPLE_DTYPES[like.sample_width]).tobytes())
+
+
+def _db_to_float(db: np.ndarray) -> np.ndarray:
+    return np.power(10.0, db / 20.0)
+
+
+def _ratio_to_db(ratio: np.ndarray) -> np.ndarray:
+    return 20.0 * np.log10(ratio)
+
+
+def _peak_gains(peaks: np.ndarray, sample_width: int, headroom: float) -> np.ndarray:
+    """Linear gain for each peak, following the same dB round trip as pydub."""
+    max_possible_amplitude = float(2 ** (sample_width * 8 - 1))
+    target_peak = max_possible_amplitude * _db_to_float(np.float64(-headroom))
+    with np.errstate(divide="ignore"):
+        gains = _db_to_float(_ratio_to_db(target_peak / peaks.astype(np.float64)))
+    # silent audio can't be normalized
+    gains[peaks == 0] = 1.0
+    return gains
+
+
+def _k_weighting_response(frame_rate: int, n_fft: int) -> np.ndarray:
+    """Power response of the BS.1770 K-weighting filter at each rfft bin."""
+    z_inv = np.exp(-1j * np.linspace(0, np.pi, n_fft // 2 + 1))
+    response = np.ones_like(z_inv)
+
+    # high shelf (head effects), then high pass (RLB weighting)
+    for gain_db, q, fc, shelf in (
+        (4.0, 1 / np.sqrt(2), 1500.0, True),
+        (0.0, 0.5, 38.0, False),
+    ):
+        a = 10 ** (gain_db / 40.0)
+        w0 = 2.0 * np.pi * fc / frame_rate
+        alpha = np.sin(w0) / (2.0 * q)
+        cos_w0 = np.cos(w0)
+        if shelf:
+            b = (
+                a * ((a + 1) + (a - 1) * cos_w0 + 2 * np.sqrt(a) * alpha),
+                -2 * a * ((a - 1) + (a + 1) * cos_w0),
+                a * ((a + 1) + (a - 1) * cos_w0 - 2 * np.sqrt(a) * alpha),
+            )
+            den = (
+                (a + 1) - (a - 1) * cos_w0 + 2 * np.sqrt(a) * alpha,
+                2 * ((a - 1) - (a + 1) * cos_w0),
+                (a + 1) - (a - 1) * cos_w0 - 2 * np.sqrt(a) * alpha,
+            )
+        else:
+            b = ((1 + cos_w0) / 2, -(1 + cos_w0), (1 + cos_w0) / 2)
+            den = (1 + alpha, -2 * cos_w0, 1 - alpha)
+        response *= (b[0] + b[1] * z_inv + b[2] * z_inv**2) / (
+            den[0] + den[1] * z_inv + den[2] * z_inv**2
+        )
+
+    return np.abs(response) ** 2
+
+
+def integrated_loudness(
+    samples: np.ndarray, sample_width: int, frame_rate: int, channels: int
+) -> float:
+    """Gated integrated loudness (LUFS) of interleaved integer samples."""
+    frames = samples.reshape(-1, channels).astype(np.float64) / float(
+        2 ** (sample_width * 8 - 1)
+    )
+    n_frames = len(frames)
+    if n_frames == 0:
+        return -np.inf
+
+    # K-weight the whole segment at once in the frequency domain, padding so the
+    # filter's tail doesn't wrap around
+    n_fft = 1 << int(np.ceil(np.log2(n_frames + frame_rate // 2)))
+    spectrum = np.fft.rfft(frames, n=n_fft, axis=0)
+    spectrum *= np.sqrt(_k_weighting_response(frame_rate, n_fft))[:, None]
+    weighted = np.fft.irfft(spectrum, n=n_fft, axis=0)[:n_frames]
+
+    # mean square of each (overlapping) gating block, per channel
+    block = int(BLOCK_SECONDS * frame_rate)
+    hop = int(block * (1 - BLOCK_OVERLAP))
+    energy = np.concatenate(
+        [np.zeros((1, channels)), np.cumsum(weighted**2, axis=0)], axis=0
+    )
+    if n_frames < block:
+        # too short to gate; measure the whole thing as one block
+        starts = np.array([0])
+        block = n_frames
+    else:
+        starts = np.arange(0, n_frames - block + 1, hop)
+    block_power = ((energy[starts + block] - energy[starts]) / block).sum(axis=1)
+
+    with np.errstate(divide="ignore"):
+        block_loudness = -0.691 + 10 * np.log10(block_power)
+        gated = block_power[block_loudness > ABSOLUTE_GATE_LUFS]
+        if len(gated) == 0:
+            return -np.inf
+        relative_gate = -0.691 + 10 * np.log10(gated.mean()) + RELATIVE_GATE_LU
+        gated = block_power[
+            (block_loudness > ABSOLUTE_GATE_LUFS) & (block_loudness > relative_gate)
+        ]
+        return float(-0.691 + 10 * np.log10(gated.mean()))
+
+
+def normalize_samples(
+    samples: Sequence[np.ndarray],
+    sample_width: int,
+    frame_rate: int,
+    channels: int,
+    mode: NormalizationMode = NormalizationMode.PEAK,
+    headroom: float = DEFAULT_HEADROOM,
+    target_lufs: float = DEFAULT_TARGET_LUFS,
+) -> List[np.ndarray]:
+    """
+    Normalize many arrays of interleaved samples (sharing one format) in a single pass.
+    """
+    if len(samples) == 0:
+        return []
+
+    lengths = np.array([len(s) for s in samples])
+    offsets = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+    flat = np.concatenate(samples).astype(np.int64)
+
+    # per-segment absolute peak; reduceat misbehaves on empty segments so mask them
+    nonempty = lengths > 0
+    peaks = np.zeros(len(samples), dtype=np.int64)
+    if nonempty.any():
+        peaks[nonempty] = np.maximum.reduceat(np.abs(flat), offsets[nonempty])
+
+    gains = _peak_gains(peaks, sample_width, headroom)
+    if mode == NormalizationMode.LOUDNESS:
+        loudness = np.array(
+            [
+                integrated_loudness(s, sample_width, frame_rate, channels)
+                for s in samples
+            ]
+        )
+        with np.errstate(invalid="ignore"):
+            loudness_gains = _db_to_float(target_lufs - loudness)
+        # never boost past the peak target (silence keeps a gain of 1)
+        gains = np.where(np.isfinite(loudness), np.minimum(gains, loudness_gains), 1.0)
+
+    # same clamp-then-floor as audioop.mul
+    limit = 2 ** (sample_width * 8 - 1)
+    scaled = np.floor(
+        np.clip(flat * np.repeat(gains, lengths), -limit, limit - 1)
+    ).astype(SAMPLE_DTYPES[sample_width])
+
+    return np.split(scaled, np.cumsum(lengths)[:-1])
+
+
+def normalize_batch(
+    segments: Sequence[AudioSegment],
+    mode: NormalizationMode = NormalizationMode.PEAK,
+    headroom: float = DEFAULT_HEADROOM,
+    target_lufs: float = DEFAULT_TARGET_LUFS,
+) -> List[AudioSegment]:
+    """Normalize each segment on its own, vectorizing over segments that share a format."""
+    groups: Dict[Tuple[int, int, int], List[int]] = {}
+    for i, segment in enumerate(segments):
+        groups.setdefault(
+            (segment.sample_width, segment.frame_rate, segment.channels), []
+        ).append(i)
+
+    normalized: List[AudioSegment] = list(segments)
+    for (sample_width, frame_rate, channels), indices in groups.items():
+        for i, samples in zip(
+            indices,
+            normalize_samples(
+                [samples_from_segment(segments[i]) for i in indices],
+                sample_width,
+                frame_rate,
+                channels,
+                mode=mode,
+                headroom=headroom,
+                target_lufs=target_lufs,
+            ),
+        ):
+            normalized[i] = segment_from_samples(samples, segments[i])
+    return normalized
+
+
+def normalize(
+    segment: AudioSegment,
+    mode: NormalizationMode = NormalizationMode.PEAK,
+    headroom: float = DEFAULT_HEADROOM,
+    target_lufs: float = DEFAULT_TARGET_LUFS,
+) -> AudioSegment:
+    """Drop-in replacement for `pydub.effects.normalize`."""
+    return normalize_batch(
+        [segment], mode=mode, headroom=headroom, target_lufs=target_lufs
+    )[0]
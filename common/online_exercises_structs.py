@@ -3,9 +3,12 @@ from enum import Enum
 import json
 from typing import Dict, List
 
+from .manifest import BuildManifest, digest, file_fingerprint
 from .structs import DatasetMetadata, PhoneticOrthography
 from .terms import read_terms_for_dataset
 
+EXPORT_JSON_STAGE = "export_json"
+
 
 @dataclass
 class OnlineExercisesCard:
@@ -26,6 +29,16 @@ class OnlineExercisesCard:
         d["phoneticOrthography"] = self.phoneticOrthography.name
         return d
 
+    def source_key(self) -> str:
+        """Identifies the terms CSV row a card was exported from."""
+        return digest(
+            self.cherokee,
+            self.cherokee_audio,
+            self.syllabary,
+            self.english,
+            self.phoneticOrthography.name,
+        )
+
 
 @dataclass
 class VocabSet:
@@ -71,7 +84,27 @@ def export_terms_to_json(
     Produces two files:
         - A cards JSON with individual card data
         - A collection JSON with card <-> vocab set relationships
+
+    Nothing is written if the terms CSV hasn't changed since the last export. Otherwise
+    cards for unchanged rows are kept as they are (including any English audio added
+    since), and only new or edited rows get fresh cards.
     """
+    manifest = BuildManifest.for_dataset(dataset)
+    inputs = digest(
+        file_fingerprint(dataset.terms),
+        dataset.collection_id,
+        dataset.collection_title,
+        dataset.phoneticOrthography.name,
+    )
+    if manifest.is_current(EXPORT_JSON_STAGE, dataset.collection_id, inputs):
+        return
+
+    previous_cards: Dict[str, OnlineExercisesCard] = {}
+    if dataset.cards_json.exists():
+        previous_cards = {
+            card.source_key(): card for card in read_cards_for_dataset(dataset)
+        }
+
     cards: List[OnlineExercisesCard] = []
     vocab_sets: Dict[str, VocabSet] = {}
     for term in read_terms_for_dataset(dataset):
@@ -85,18 +118,17 @@ def export_terms_to_json(
 
             vocab_sets[term.vocab_set].terms.append(term.cherokee)
 
-            cards.append(
-                OnlineExercisesCard(
-                    english=term.english,
-                    english_audio=[],
-                    syllabary=term.syllabary,
-                    cherokee=term.cherokee,
-                    cherokee_audio=[term.audio],
-                    alternate_pronunciations=[],
-                    alternate_syllabary=[],
-                    phoneticOrthography=dataset.phoneticOrthography,
-                )
+            card = OnlineExercisesCard(
+                english=term.english,
+                english_audio=[],
+                syllabary=term.syllabary,
+                cherokee=term.cherokee,
+                cherokee_audio=[term.audio],
+                alternate_pronunciations=[],
+                alternate_syllabary=[],
+                phoneticOrthography=dataset.phoneticOrthography,
             )
+            cards.append(previous_cards.get(card.source_key(), card))
 
     write_cards_json_for_dataset(dataset, cards)
 
@@ -112,3 +144,11 @@ def export_terms_to_json(
             f,
             ensure_ascii=False,
         )
+
+    manifest.record(
+        EXPORT_JSON_STAGE,
+        dataset.collection_id,
+        inputs,
+        outputs=[dataset.cards_json, dataset.collection_json],
+    )
+    manifest.save()
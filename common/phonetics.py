@@ -0,0 +1,102 @@
+"""
+Compiled phonetic normalization profiles, shared by matching and the dictionary scripts.
+
+A profile is an ordered list of steps (lowercasing, removing a pattern, substituting
+letters). Each step is compiled once: substitutions become a `str.translate` table, or
+a single regex pass when some of them span more than one character, so a profile is
+never a chain of `str.replace` calls. Results are memoized, since the same phonetics
+are normalized over and over while matching.
+"""
+from functools import lru_cache
+import re
+from typing import Callable, Dict, Iterable, List
+
+Step = Callable[[str], str]
+
+PROFILE_CACHE_SIZE = 1 << 16
+
+
+def lowercase() -> Step:
+    return str.lower
+
+
+def remove(pattern: str) -> Step:
+    """Delete every match of `pattern`."""
+    compiled = re.compile(pattern)
+    return lambda text: compiled.sub("", text)
+
+
+def substitute(replacements: Dict[str, str]) -> Step:
+    """
+    Replace every key with its value in one left-to-right pass, preferring longer
+    keys, so one substitution's output is never rewritten by another.
+    """
+    if all(len(key) == 1 for key in replacements):
+        table = str.maketrans(replacements)
+        return lambda text: text.translate(table)
+
+    compiled = re.compile(
+        "|".join(re.escape(key) for key in sorted(replacements, key=len, reverse=True))
+    )
+    return lambda text: compiled.sub(lambda match: replacements[match[0]], text)
+
+
+class PhoneticProfile:
+    def __init__(self, name: str, *steps: Step):
+        self.name = name
+        self.steps = steps
+        self._normalize = lru_cache(maxsize=PROFILE_CACHE_SIZE)(self._apply)
+
+    def _apply(self, text: str) -> str:
+        for step in self.steps:
+            text = step(text)
+        return text
+
+    def __call__(self, text: str) -> str:
+        return self._normalize(text)
+
+    def batch(self, texts: Iterable[str]) -> List[str]:
+        """Normalize many texts, doing the work once per distinct text."""
+        texts = list(texts)
+        normalized = {text: self._normalize(text) for text in dict.fromkeys(texts)}
+        return [normalized[text] for text in texts]
+
+    def __repr__(self):
+        return f"PhoneticProfile({self.name!r})"
+
+
+CANONICAL_MARKS = {"Ɂ": "ɂ", "ʔ": "ɂ", "ː": ":"}
+"""Variant glottal stop and vowel length characters, and what they're written as here."""
+
+CANONICAL = PhoneticProfile("canonical", lowercase(), substitute(CANONICAL_MARKS))
+"""Lowercase, with one spelling of the glottal stop and vowel length."""
+
+FOLDED_SPELLING = PhoneticProfile(
+    "folded_spelling",
+    lowercase(),
+    substitute({"j": "ts", "qu": "gw", **CANONICAL_MARKS}),
+)
+"""As `CANONICAL`, also writing j as ts and qu as gw so either spelling matches."""
+
+MINIFIED = PhoneticProfile(
+    "minified",
+    # tones, glottal stops and vowel length; JW writes drop-vowels followed by a comma
+    remove(r"[\:ɂ¹²³⁴]|(.,)"),
+    lowercase(),
+)
+"""Bare letters of rich phonetics, for comparing against untoned annotations."""
+
+SPOKEN = PhoneticProfile(
+    "spoken",
+    # JW writes drop-vowels followed by a comma
+    remove(r".,"),
+    lowercase(),
+    substitute(CANONICAL_MARKS),
+)
+"""As `CANONICAL`, without the vowels that aren't pronounced, but keeping the marks."""
+
+HANDBOOK_TO_JW = PhoneticProfile(
+    "handbook_to_jw",
+    substitute({"th": "t", "dh": "t", "t": "d", "kh": "k", "gh": "k", "k": "g"}),
+)
+"""Handbook consonants (t/k plain, th/kh aspirated) in JW's d/g, t/k spelling."""
@@ -0,0 +1,97 @@
+"""
+Tracks which split audio files in `DatasetMetadata.audio_output_dir` are up to date.
+
+Each split audio file is recorded against a key built from the content of its source
+recording, its time range, and the normalization and encoder settings used to make it.
+A file is rebuilt whenever its key changes, eg. because the source WAV was re-exported.
+Split audio made before a dataset had a manifest is adopted as it is rather than
+rebuilt.
+"""
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Dict
+
+from common.manifest import file_sha1, read_manifest, write_manifest
+from common.normalization import NormalizationMode
+from common.structs import DatasetMetadata
+
+SPLIT_AUDIO_NORMALIZATION = NormalizationMode.PEAK
+SPLIT_AUDIO_HEADROOM = 0.1
+"""Headroom (dB) used when normalizing split audio."""
+
+SPLIT_AUDIO_FORMAT = "mp3"
+SPLIT_AUDIO_EXPORT_PARAMETERS = ["-qscale:a", "0"]
+
+MANIFEST_NAME = "split_audio_manifest.json"
+
+
+class SplitAudioCache:
+    def __init__(self, manifest_path: Path, folder: Path):
+        self.manifest_path = manifest_path
+        self.folder = folder
+        # without a manifest, nothing can say existing files are stale
+        self.adopt_existing = not manifest_path.exists()
+        manifest = read_manifest(manifest_path)
+        # source path (relative to `folder`) -> {size, mtime_ns, sha1}, so unchanged
+        # sources aren't re-hashed
+        self.sources: Dict[str, Dict] = manifest.get("sources", {})
+        # split audio file name -> cache key
+        self.split_audio: Dict[str, str] = manifest.get("split_audio", {})
+
+    @staticmethod
+    def for_dataset(dataset: DatasetMetadata) -> "SplitAudioCache":
+        return SplitAudioCache(dataset.audio_output_dir / MANIFEST_NAME, dataset.folder)
+
+    def source_digest(self, source_path: Path) -> str:
+        """Content hash of a source recording, only recomputed when the file changes."""
+        stat = source_path.stat()
+        source_key = Path(os.path.relpath(source_path, self.folder)).as_posix()
+        entry = self.sources.get(source_key)
+        if (
+            entry is None
+            or entry["size"] != stat.st_size
+            or entry["mtime_ns"] != stat.st_mtime_ns
+        ):
+            entry = {
+                "size": stat.st_size,
+                "mtime_ns": stat.st_mtime_ns,
+                "sha1": file_sha1(source_path),
+            }
+            self.sources[source_key] = entry
+        return entry["sha1"]
+
+    @staticmethod
+    def key(source_digest: str, start_ms: int, end_ms: int) -> str:
+        return hashlib.sha1(
+            json.dumps(
+                {
+                    "source": source_digest,
+                    "start_ms": start_ms,
+                    "end_ms": end_ms,
+                    "normalization": SPLIT_AUDIO_NORMALIZATION.value,
+                    "headroom": SPLIT_AUDIO_HEADROOM,
+                    "format": SPLIT_AUDIO_FORMAT,
+                    "parameters": SPLIT_AUDIO_EXPORT_PARAMETERS,
+                },
+                sort_keys=True,
+            ).encode("UTF-8")
+        ).hexdigest()
+
+    def is_fresh(self, split_audio_path: Path, key: str) -> bool:
+        recorded = self.split_audio.get(split_audio_path.name)
+        if recorded is None and self.adopt_existing and split_audio_path.exists():
+            # cut before there was a manifest; its name says it's the same range
+            self.record(split_audio_path, key)
+            return True
+        return recorded == key and split_audio_path.exists()
+
+    def record(self, split_audio_path: Path, key: str):
+        self.split_audio[split_audio_path.name] = key
+
+    def save(self):
+        write_manifest(
+            self.manifest_path,
+            {"sources": self.sources, "split_audio": self.split_audio},
+        )
@@ -22,6 +22,9 @@ class AnnotationFormat(Enum):
     CHEROKEE_NONEMPTY = "CHEROKEE_NONEMPTY"
     """All nonempty annotations are Cherokee audio."""
 
+    ALL = "ALL"
+    """Every annotation is Cherokee audio."""
+
     @classmethod
     def default(cls):
         return cls.ENGLISH_CHEROKEE_ALTERNATING
@@ -43,18 +46,38 @@ class TermFormat(Enum):
         return cls.RICH
 
 
+class CardsBuilder(Enum):
+    """
+    A CardsBuilder names the stage that writes a dataset's cards JSON.
+    """
+
+    TERMS = "TERMS"
+    """Cards are exported from the terms CSV, then given TTS English audio."""
+
+    KANOHEDA = "KANOHEDA"
+    """`kanoheda` builds cards (and a lesson) with recorded English where there is some."""
+
+    @classmethod
+    def default(cls):
+        return cls.TERMS
+
+
 @dataclass
 class DatasetMetadata:
     audio_source: Path
     english_audio_source: Optional[Path]
     annotations: Path
     english_annotations: Optional[Path]
+    annotation_tier: Optional[str]
+    """ELAN tier to read annotations from (default: every tier)."""
+    english_annotation_tier: Optional[str]
     annotation_format: AnnotationFormat
     terms: Path
     folder: Path
     collection_title: str
     collection_id: str
     phoneticOrthography: PhoneticOrthography
+    cards_builder: CardsBuilder
 
     @staticmethod
     def from_file(path: Union[str, Path]):
@@ -76,6 +99,8 @@ class DatasetMetadata:
             english_annotations=None
             if english_annotations is None
             else path.parent / Path(english_annotations),
+            annotation_tier=data.get("annotation_tier", None),
+            english_annotation_tier=data.get("english_annotation_tier", None),
             annotation_format=AnnotationFormat(
                 data.get("annotation_format", AnnotationFormat.default().value)
             ),
@@ -86,8 +111,15 @@ class DatasetMetadata:
             phoneticOrthography=PhoneticOrthography(
                 data.get("phonetic_orthography", None)
             ),
+            cards_builder=CardsBuilder(
+                data.get("cards_builder", CardsBuilder.default().value)
+            ),
         )
 
+    @property
+    def auto_annotations(self):
+        return self.folder / "auto_annotations.txt"
+
     @property
     def backup_terms(self):
         return self.folder / "terms.back.csv"
@@ -96,6 +128,14 @@ class DatasetMetadata:
     def new_terms(self):
         return self.folder / "terms.new.csv"
 
+    @property
+    def build_manifest(self):
+        return self.folder / "build_manifest.json"
+
+    @property
+    def match_journal(self):
+        return self.folder / "terms.journal.jsonl"
+
     @property
     def audio_output_dir(self):
         return self.folder / "card_audio"
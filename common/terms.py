@@ -1,8 +1,9 @@
 """
 Python module for interfacing with a terms CSV (ie. the CSV referenced by `DatasetMetadata.terms`)
 """
-from csv import DictReader
-from dataclasses import dataclass
+from csv import DictReader, DictWriter
+from dataclasses import asdict, dataclass
+from typing import Iterable
 
 from common.structs import DatasetMetadata
 
@@ -36,3 +37,15 @@ def read_terms_for_dataset(dataset: DatasetMetadata):
             if row == {}:
                 continue
             yield TermRow(**row)
+
+
+def write_terms_for_dataset(dataset: DatasetMetadata, terms: Iterable[TermRow]):
+    """Replace the terms CSV, keeping the previous version as a backup."""
+    with open(dataset.new_terms, "w") as f:
+        writer = DictWriter(f, fieldnames=TERM_FIELDS, delimiter=",")
+        for term in terms:
+            writer.writerow(asdict(term))
+
+    # write terms to backup; new file to terms
+    dataset.terms.replace(dataset.backup_terms)
+    dataset.new_terms.replace(dataset.terms)
@@ -4,7 +4,10 @@ from sys import argv
 
 from common.structs import DatasetMetadata
 
+from .cache_manager import parse_size
 from .generate_english_audio_for_deck import main
+from .synthesis import DEFAULT_WORKERS, SynthesisSettings
+from .tts import TTS_BACKENDS
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(
@@ -16,6 +19,31 @@ if __name__ == "__main__":
         type=str,
         help="Path to folder containing dataset, eg. `data/jw-living-phrases`",
     )
+    parser.add_argument(
+        "--tts-backend",
+        choices=list(TTS_BACKENDS),
+        default="polly",
+        help="Where to synthesize audio; `stub` makes placeholder tones offline.",
+    )
+    parser.add_argument(
+        "--tts-workers",
+        type=int,
+        default=DEFAULT_WORKERS,
+        help=f"Number of TTS requests in flight at once (default: {DEFAULT_WORKERS}).",
+    )
+    parser.add_argument(
+        "--cache-max-size",
+        type=parse_size,
+        default=None,
+        help="Afterwards, evict least recently used clips from the TTS cache until it fits, eg. `2G`.",
+    )
     args = parser.parse_args()
     dataset = DatasetMetadata.from_file(Path(args.dataset_folder) / "dataset.json")
-    main(dataset)
+    main(
+        dataset,
+        synthesis=SynthesisSettings(
+            backend=args.tts_backend,
+            workers=args.tts_workers,
+            cache_max_bytes=args.cache_max_size,
+        ),
+    )
@@ -0,0 +1,168 @@
+"""
+SQLite index of the clips in the English TTS cache, so the cache can be queried in
+bulk instead of hashing and stat-ing one prompt at a time.
+"""
+from __future__ import annotations
+
+import math
+import os
+from pathlib import Path
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Tuple
+
+from pydub import AudioSegment
+
+from common.normalization import integrated_loudness, samples_from_segment
+
+from .tts import CACHE_EN, normalize_tts_text
+
+CACHE_INDEX = Path(CACHE_EN) / "index.sqlite"
+
+ClipKey = Tuple[str, str, float]
+"""(voice, normalized text, alpha)"""
+
+
+def clip_key(voice: str | None, text: str, alpha: float | None = None) -> ClipKey:
+    return (voice or "-", normalize_tts_text(text), alpha or 1.0)
+
+
+class TTSCacheIndex:
+    """
+    Every cached clip, keyed by voice, normalized text and alpha, with its path,
+    size, duration, loudness and when it was last used. Duration and loudness are
+    only known for clips the index saw being written; clips adopted from an older
+    cache have them as None.
+
+    Safe to share between threads. Separate processes can use the same index too:
+    the database is in WAL mode and writers wait for each other.
+    """
+
+    def __init__(self, path: Path = CACHE_INDEX):
+        self.path = path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS clips (
+                voice TEXT NOT NULL,
+                text TEXT NOT NULL,
+                alpha REAL NOT NULL,
+                path TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                duration_ms INTEGER,
+                loudness_lufs REAL,
+                last_access REAL,
+                PRIMARY KEY (voice, text, alpha)
+            )
+            """
+        )
+        columns = [row[1] for row in self._db.execute("PRAGMA table_info(clips)")]
+        if "last_access" not in columns:
+            # index written before clips were evicted
+            self._db.execute("ALTER TABLE clips ADD COLUMN last_access REAL")
+        self._db.execute("CREATE INDEX IF NOT EXISTS clips_path ON clips (path)")
+        self._db.commit()
+
+    def lookup(self, keys: Iterable[ClipKey]) -> Dict[ClipKey, str]:
+        """Path of every key that's in the index, found with a single join."""
+        with self._lock:
+            self._db.execute(
+                "CREATE TEMP TABLE IF NOT EXISTS wanted (voice TEXT, text TEXT, alpha REAL)"
+            )
+            self._db.execute("DELETE FROM wanted")
+            self._db.executemany("INSERT INTO wanted VALUES (?, ?, ?)", keys)
+            rows = self._db.execute(
+                """
+                SELECT clips.voice, clips.text, clips.alpha, clips.path
+                FROM wanted JOIN clips USING (voice, text, alpha)
+                """
+            ).fetchall()
+            self._db.execute("DELETE FROM wanted")
+        return {(voice, text, alpha): path for voice, text, alpha, path in rows}
+
+    def record(self, key: ClipKey, path: str, audio: AudioSegment | None = None):
+        """
+        Add or replace a clip. Pass the decoded `audio` when it's at hand to also
+        store its duration and loudness.
+        """
+        duration_ms = None
+        loudness_lufs = None
+        if audio is not None:
+            duration_ms = len(audio)
+            loudness_lufs = integrated_loudness(
+                samples_from_segment(audio),
+                audio.sample_width,
+                audio.frame_rate,
+                audio.channels,
+            )
+            if not math.isfinite(loudness_lufs):
+                loudness_lufs = None
+        self.record_many(
+            [(key, path, os.path.getsize(path), duration_ms, loudness_lufs)]
+        )
+
+    def record_many(
+        self, rows: List[Tuple[ClipKey, str, int, int | None, float | None]]
+    ):
+        now = time.time()
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO clips VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (*key, path, size, duration, loudness, now)
+                    for key, path, size, duration, loudness in rows
+                ],
+            )
+            self._db.commit()
+
+    def touch(self, keys: Iterable[ClipKey]):
+        """Mark clips as just used, so they're the last to be evicted."""
+        now = time.time()
+        with self._lock:
+            self._db.executemany(
+                """
+                UPDATE clips SET last_access = ?
+                WHERE voice = ? AND text = ? AND alpha = ?
+                """,
+                [(now, *key) for key in keys],
+            )
+            self._db.commit()
+
+    def last_access(self) -> Dict[str, float]:
+        """When each indexed clip was last used, by path."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT path, last_access FROM clips WHERE last_access IS NOT NULL"
+            ).fetchall()
+        return dict(rows)
+
+    def move(self, paths: Iterable[Tuple[str, str]]):
+        """Point clips at their new paths, given (old path, new path) pairs."""
+        with self._lock:
+            self._db.executemany(
+                "UPDATE clips SET path = ? WHERE path = ?",
+                [(new, old) for old, new in paths],
+            )
+            self._db.commit()
+
+    def remove_paths(self, paths: Iterable[str]):
+        with self._lock:
+            self._db.executemany(
+                "DELETE FROM clips WHERE path = ?", [(path,) for path in paths]
+            )
+            self._db.commit()
+
+    def remove(self, keys: Iterable[ClipKey]):
+        with self._lock:
+            self._db.executemany(
+                "DELETE FROM clips WHERE voice = ? AND text = ? AND alpha = ?", keys
+            )
+            self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,182 @@
+"""
+Upkeep of the English TTS cache: moving clips into their hash-prefix subdirectories
+and evicting the least recently used clips once the cache outgrows a size cap.
+
+Run with `python -m generate_english_audio.cache_manager`. Clips used by any dataset's
+current cards JSON are never evicted, whatever their age, and neither are clips used in
+the last `EVICTION_GRACE_S` seconds, which decks being built right now may still read.
+"""
+import argparse
+import json
+import os
+from pathlib import Path
+import re
+import time
+from typing import List, Optional, Set
+
+from .cache_index import TTSCacheIndex
+from .locking import clip_lock
+from .pcm_cache import pcm_files
+from .tts import CACHE_EN, get_flat_path, get_sharded_path
+
+SIZE_UNITS = {"": 1, "K": 2**10, "M": 2**20, "G": 2**30, "T": 2**40}
+
+EVICTION_GRACE_S = 15 * 60
+"""
+Clips used this recently are never evicted: another process may have been handed one
+by `tts_batch` and not have copied or decoded it yet.
+"""
+
+
+def parse_size(size: str) -> int:
+    """Bytes in a size like `500M` or `2G`."""
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([KMGT]?)i?B?\s*", size.upper())
+    if match is None:
+        raise ValueError(f"Not a size: {size!r}")
+    return int(float(match[1]) * SIZE_UNITS[match[2]])
+
+
+def cached_clips() -> Set[str]:
+    """
+    Path of every clip in the cache, from one listing per shard, including clips
+    still at the top level from before the cache was sharded. The symlinks
+    `migrate_flat_clips` leaves at the top level aren't clips of their own.
+    """
+    clips = set()
+    try:
+        entries = list(os.scandir(CACHE_EN))
+    except FileNotFoundError:
+        return clips
+    for entry in entries:
+        if entry.is_dir():
+            clips.update(
+                os.path.join(entry.path, name)
+                for name in os.listdir(entry.path)
+                if name.endswith(".mp3")
+            )
+        elif entry.name.endswith(".mp3") and not entry.is_symlink():
+            clips.add(entry.path)
+    return clips
+
+
+def referenced_clips(data_folder: Path = Path("data")) -> Set[str]:
+    """Names of the clips English audio in any dataset's cards JSON was copied from."""
+    names = set()
+    for cards_json in data_folder.glob("**/*-cards.json"):
+        with open(cards_json) as f:
+            cards = json.load(f)
+        for card in cards:
+            names.update(Path(audio).name for audio in card.get("english_audio", []))
+    return names
+
+
+def migrate_flat_clips(index: TTSCacheIndex) -> int:
+    """
+    Move clips from the top level of the cache into their shards, leaving a symlink
+    at each old path for projects that still read the flat layout.
+    """
+    moved = []
+    for path in cached_clips():
+        name = os.path.basename(path)
+        if os.path.dirname(path) != CACHE_EN:
+            continue
+        sharded = get_sharded_path(name)
+        os.makedirs(os.path.dirname(sharded), exist_ok=True)
+        os.replace(path, sharded)
+        os.symlink(os.path.relpath(sharded, CACHE_EN), path)
+        moved.append((path, sharded))
+        for pcm_file, sharded_pcm_file in zip(pcm_files(path), pcm_files(sharded)):
+            if os.path.exists(pcm_file):
+                os.replace(pcm_file, sharded_pcm_file)
+    index.move(moved)
+    return len(moved)
+
+
+def evict(
+    index: TTSCacheIndex,
+    max_bytes: int,
+    keep: Set[str],
+    grace_s: float = EVICTION_GRACE_S,
+) -> List[str]:
+    """
+    Remove the least recently used clips until the cache is at most `max_bytes`,
+    skipping clips whose names are in `keep` and clips used in the last `grace_s`
+    seconds. A clip's decoded samples count towards its size and are removed with
+    it. Clips the index hasn't seen used are aged by their modification time. Each
+    clip is removed under its `clip_lock`, so it can't be removed while another
+    process is writing it. Returns the paths removed.
+    """
+    recent = time.time() - grace_s
+    last_access = index.last_access()
+    clips = []
+    for path in cached_clips():
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            continue
+        size = stat.st_size + sum(
+            os.path.getsize(f) for f in pcm_files(path) if os.path.exists(f)
+        )
+        clips.append((last_access.get(path, stat.st_mtime), size, path))
+
+    total = sum(size for _, size, _ in clips)
+    removed = []
+    for last_used, size, path in sorted(clips):
+        if total <= max_bytes:
+            break
+        if os.path.basename(path) in keep or last_used > recent:
+            continue
+        with clip_lock(path):
+            flat = get_flat_path(os.path.basename(path))
+            if os.path.islink(flat):
+                os.remove(flat)
+            for file in [path, *pcm_files(path)]:
+                try:
+                    os.remove(file)
+                except FileNotFoundError:
+                    pass
+        total -= size
+        removed.append(path)
+    index.remove_paths(removed)
+    return removed
+
+
+def main(data_folder: Path, max_size: Optional[str], migrate: bool):
+    index = TTSCacheIndex()
+    if migrate:
+        print(f"Moved {migrate_flat_clips(index)} clips into shards")
+    if max_size is not None:
+        removed = evict(index, parse_size(max_size), referenced_clips(data_folder))
+        print(f"Evicted {len(removed)} clips")
+    index.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        "generate_english_audio.cache_manager",
+        description="Shard the English TTS cache and keep it under a size cap",
+    )
+    parser.add_argument(
+        "--max-size",
+        type=str,
+        default=None,
+        help="Evict least recently used clips until the cache fits, eg. `2G`.",
+    )
+    parser.add_argument(
+        "--migrate",
+        action=argparse.BooleanOptionalAction,
+        default=False,
+        help="Move clips cached before sharding into their subdirectories, leaving symlinks behind.",
+    )
+    parser.add_argument(
+        "--data-folder",
+        type=str,
+        default="data",
+        help="Folder whose cards JSON files say which clips are in use (default: data).",
+    )
+    args = parser.parse_args()
+    main(
+        data_folder=Path(args.data_folder),
+        max_size=args.max_size,
+        migrate=args.migrate,
+    )
@@ -1,9 +1,13 @@
+import dataclasses
 import os
 from pathlib import Path
 import shutil
+from typing import List
+from common.manifest import BuildManifest, digest, file_fingerprint
 from common.structs import DatasetMetadata
 
-from .tts import AMZ_VOICES, get_mp3_en, tts_en
+from .synthesis import SynthesisSettings, tts_batch
+from .tts import AMZ_VOICES, TTSBatchEntry, get_cache_path
 
 from common.online_exercises_structs import (
     OnlineExercisesCard,
@@ -12,29 +16,26 @@ from common.online_exercises_structs import (
 )
 
 
+ENGLISH_AUDIO_STAGE = "english_audio"
+"""Build manifest stage with an entry per English text."""
+
+ENGLISH_AUDIO_JSON_STAGE = "english_audio_json"
+"""Build manifest stage recording which cards JSON already has English audio."""
+
+
 def get_app_filename(dataset: DatasetMetadata, cache_filename: str) -> str:
     return str(dataset.audio_output_dir / Path(cache_filename).name)
 
 
 def get_cache_filename_from_app_filename(app_filename: str):
-    # change source/en/foo.wav --> cache/en/foo.wav
-    return f"cache/en/{Path(app_filename).name}"
-
-
-def generate_audio_for_voice(voice: str, text: str) -> str:
-    """
-    Create English audio mp3 and return path to cached mp3.
-    """
-    tts_en(voice, text)
-    return get_mp3_en(voice, text)
+    # change source/en/foo.wav --> cache/en/<shard>/foo.wav
+    return get_cache_path(Path(app_filename).name)
 
 
 def generate_english_audio(
-    dataset: DatasetMetadata, card: OnlineExercisesCard
+    dataset: DatasetMetadata, card: OnlineExercisesCard, cached_audio: List[str]
 ) -> OnlineExercisesCard:
-    cached_audio = [
-        generate_audio_for_voice(voice, card.english) for voice in AMZ_VOICES
-    ]
+    """Card with English audio, given the cached mp3 for each of `AMZ_VOICES`."""
     return OnlineExercisesCard(
         cherokee=card.cherokee,
         cherokee_audio=card.cherokee_audio,
@@ -49,14 +50,68 @@ def generate_english_audio(
     )
 
 
-def main(dataset: DatasetMetadata):
+def main(dataset: DatasetMetadata, synthesis: SynthesisSettings = SynthesisSettings()):
+    """
+    Add English audio to every card, only synthesizing and copying audio for cards
+    whose English (or the voices used) changed since the last run. Audio for all of
+    those cards is synthesized concurrently up front.
+    """
+    manifest = BuildManifest.for_dataset(dataset)
+    json_inputs = digest(file_fingerprint(dataset.cards_json), AMZ_VOICES)
+    if manifest.is_current(
+        ENGLISH_AUDIO_JSON_STAGE, dataset.collection_id, json_inputs
+    ):
+        return
+
     cards = read_cards_for_dataset(dataset)
-    cards_with_english = [generate_english_audio(dataset, card) for card in cards]
-    write_cards_json_for_dataset(dataset, cards_with_english)
-
-    for card in cards_with_english:
-        for appfile in card.english_audio:
-            shutil.copy(
-                get_cache_filename_from_app_filename(appfile),
-                appfile,
+    card_inputs = digest(AMZ_VOICES)
+    entries = [
+        manifest.get(ENGLISH_AUDIO_STAGE, card.english, card_inputs) for card in cards
+    ]
+    cached_audio = iter(
+        tts_batch(
+            [
+                TTSBatchEntry(voice=voice, text=card.english)
+                for card, entry in zip(cards, entries)
+                if entry is None
+                for voice in AMZ_VOICES
+            ],
+            synthesis,
+        )
+    )
+
+    cards_with_english = []
+    for card, entry in zip(cards, entries):
+        if entry is not None:
+            # the same clips, under this run's path to the dataset
+            card_with_english = dataclasses.replace(
+                card,
+                english_audio=[
+                    get_app_filename(dataset, audio) for audio in entry["data"]
+                ],
             )
+        else:
+            card_audio = [next(cached_audio) for _ in AMZ_VOICES]
+            card_with_english = generate_english_audio(dataset, card, card_audio)
+            for cache_file, appfile in zip(card_audio, card_with_english.english_audio):
+                shutil.copy(cache_file, appfile)
+            manifest.record(
+                ENGLISH_AUDIO_STAGE,
+                card.english,
+                card_inputs,
+                outputs=card_with_english.english_audio,
+                data=card_with_english.english_audio,
+            )
+        cards_with_english.append(card_with_english)
+
+    if cards_with_english != cards:
+        write_cards_json_for_dataset(dataset, cards_with_english)
+
+    manifest.prune(ENGLISH_AUDIO_STAGE, (card.english for card in cards))
+    manifest.record(
+        ENGLISH_AUDIO_JSON_STAGE,
+        dataset.collection_id,
+        digest(file_fingerprint(dataset.cards_json), AMZ_VOICES),
+        outputs=[dataset.cards_json],
+    )
+    manifest.save()
@@ -0,0 +1,104 @@
+"""
+Writing clips into a cache that other threads and processes use at the same time.
+
+Every clip this repository writes appears whole or not at all, whoever else is writing
+to the cache. Synthesizing each clip only once is weaker: it holds between threads and
+processes running this code, which all take the same `.lock` files. Other writers,
+like audio-lessons-generator-python, don't take them, so they may still synthesize a
+clip we are synthesizing too (though neither copy is ever torn by the other).
+"""
+from concurrent.futures import Future
+from contextlib import contextmanager
+import os
+import tempfile
+import threading
+from typing import Callable, Dict
+
+try:
+    import fcntl
+except ImportError:  # Windows: only threads of this process are kept apart
+    fcntl = None
+
+_in_flight: Dict[str, Future] = {}
+_in_flight_lock = threading.Lock()
+
+
+@contextmanager
+def clip_lock(path: str):
+    """
+    Exclusive lock on `path` between processes that use this function, held with a
+    `.lock` file beside it. The lock file is removed on release; whoever opened it
+    just before then notices it's been replaced and locks the new one instead.
+    """
+    if fcntl is None:
+        yield
+        return
+    lock_path = path + ".lock"
+    while True:
+        fd = os.open(lock_path, os.O_CREAT | os.O_RDWR, 0o644)
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        try:
+            if os.fstat(fd).st_ino == os.stat(lock_path).st_ino:
+                break
+        except FileNotFoundError:
+            pass
+        os.close(fd)
+    try:
+        yield
+    finally:
+        os.unlink(lock_path)
+        os.close(fd)
+
+
+def publish(path: str, data: bytes):
+    """
+    Write `path` through a uniquely named temp file that's renamed over it, so it
+    appears whole or not at all, even with writers that don't take `clip_lock`.
+    """
+    folder, name = os.path.split(path)
+    fd, tmp_path = tempfile.mkstemp(dir=folder, prefix=f".{name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as w:
+            w.write(data)
+            w.flush()
+            os.fsync(w.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def cache_clip(path: str, synthesize: Callable[[], bytes]) -> bool:
+    """
+    Make sure the clip at `path` exists, calling `synthesize` for its contents if it
+    doesn't. Threads of this process asking for the same clip wait for the first one
+    rather than each taking the lock in turn, and other processes running this code
+    wait on the lock.
+
+    Returns whether this call wrote the clip.
+    """
+    with _in_flight_lock:
+        in_flight = _in_flight.get(path)
+        if in_flight is None:
+            in_flight = _in_flight[path] = Future()
+            owner = True
+        else:
+            owner = False
+    if not owner:
+        in_flight.result()
+        return False
+
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with clip_lock(path):
+            written = not os.path.exists(path)
+            if written:
+                publish(path, synthesize())
+    except BaseException as e:
+        in_flight.set_exception(e)
+        raise
+    finally:
+        with _in_flight_lock:
+            del _in_flight[path]
+    in_flight.set_result(written)
+    return written
@@ -0,0 +1,109 @@
+"""
+Second tier of the English TTS cache: each clip's normalized samples, saved beside its
+mp3 as a `.npy` array, so reusing a clip costs neither an ffmpeg decode nor
+normalization, only reading the samples back in.
+"""
+from dataclasses import asdict, dataclass
+import io
+import json
+import os
+from typing import List, Optional, Tuple
+
+import numpy as np
+from pydub import AudioSegment
+
+from common.normalization import DEFAULT_HEADROOM, normalize, samples_from_segment
+
+from .locking import publish
+
+PCM_SUFFIX = ".pcm.npy"
+METADATA_SUFFIX = ".pcm.json"
+
+
+@dataclass
+class PCMMetadata:
+    frame_rate: int
+    channels: int
+    sample_width: int
+    headroom: float
+    """Peak normalization the samples were saved with."""
+
+    source_size: int
+    source_mtime_ns: int
+    """The mp3 the samples were decoded from, to notice it being replaced."""
+
+
+def pcm_files(mp3_path: str) -> List[str]:
+    """The samples and metadata files kept for a cached mp3."""
+    stem = mp3_path[: -len(".mp3")]
+    return [stem + PCM_SUFFIX, stem + METADATA_SUFFIX]
+
+
+def _source_metadata(mp3_path: str, segment: AudioSegment) -> PCMMetadata:
+    stat = os.stat(mp3_path)
+    return PCMMetadata(
+        frame_rate=segment.frame_rate,
+        channels=segment.channels,
+        sample_width=segment.sample_width,
+        headroom=DEFAULT_HEADROOM,
+        source_size=stat.st_size,
+        source_mtime_ns=stat.st_mtime_ns,
+    )
+
+
+def load_pcm(mp3_path: str) -> Optional[Tuple[np.ndarray, PCMMetadata]]:
+    """
+    Memory-mapped samples (frames x channels) of a clip and their metadata, or None
+    if they haven't been saved or are out of date.
+    """
+    pcm_path, metadata_path = pcm_files(mp3_path)
+    try:
+        with open(metadata_path) as f:
+            metadata = PCMMetadata(**json.load(f))
+        stat = os.stat(mp3_path)
+        samples = np.load(pcm_path, mmap_mode="r")
+    except (FileNotFoundError, ValueError, TypeError):
+        return None
+    if (
+        metadata.headroom != DEFAULT_HEADROOM
+        or metadata.source_size != stat.st_size
+        or metadata.source_mtime_ns != stat.st_mtime_ns
+    ):
+        return None
+    return samples, metadata
+
+
+def store_pcm(mp3_path: str, segment: AudioSegment):
+    """Save the samples of `segment`, already normalized, for the clip at `mp3_path`."""
+    pcm_path, metadata_path = pcm_files(mp3_path)
+    samples = samples_from_segment(segment).reshape(-1, segment.channels)
+    buffer = io.BytesIO()
+    np.save(buffer, samples)
+    # the metadata goes last, so samples are never read before they're complete;
+    # processes saving the same clip at once write the same files, whichever wins
+    publish(pcm_path, buffer.getvalue())
+    publish(
+        metadata_path, json.dumps(asdict(_source_metadata(mp3_path, segment))).encode()
+    )
+
+
+def normalized_samples(mp3_path: str) -> Tuple[np.ndarray, PCMMetadata]:
+    """Normalized samples of a cached clip, decoding and saving them on first use."""
+    loaded = load_pcm(mp3_path)
+    if loaded is not None:
+        return loaded
+    segment = normalize(AudioSegment.from_file(mp3_path, format="mp3"))
+    store_pcm(mp3_path, segment)
+    samples = samples_from_segment(segment).reshape(-1, segment.channels)
+    return samples, _source_metadata(mp3_path, segment)
+
+
+def normalized_segment(mp3_path: str) -> AudioSegment:
+    samples, metadata = normalized_samples(mp3_path)
+    # pydub concatenates raw data with `+`, so the mapped samples are copied to bytes
+    return AudioSegment(
+        data=samples.tobytes(),
+        sample_width=metadata.sample_width,
+        frame_rate=metadata.frame_rate,
+        channels=metadata.channels,
+    )
@@ -0,0 +1,177 @@
+"""
+Concurrent English TTS: synthesizes every uncached clip at once on a thread pool,
+within a rate limit, retrying requests that fail or time out.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+import os
+import re
+import threading
+import time
+from typing import Dict, List, Optional, Sequence
+
+from pydub import AudioSegment
+
+from .cache_index import ClipKey, TTSCacheIndex, clip_key
+from .cache_manager import cached_clips, evict, referenced_clips
+from .locking import cache_clip
+from .tts import (
+    DEFAULT_RETRIES,
+    DEFAULT_TIMEOUT_S,
+    TTSBackend,
+    TTSBatchEntry,
+    get_flat_path,
+    get_mp3_en,
+    get_tts_backend,
+    synthesize_with_retries,
+)
+
+DEFAULT_WORKERS = 8
+DEFAULT_RATE = 8.0
+"""Requests per second; Polly's default quota for neural voices."""
+
+
+@dataclass
+class SynthesisSettings:
+    backend: str = "polly"
+    workers: int = DEFAULT_WORKERS
+    rate: float = DEFAULT_RATE
+    retries: int = DEFAULT_RETRIES
+    timeout_s: float = DEFAULT_TIMEOUT_S
+    cache_max_bytes: Optional[int] = None
+    """Evict least recently used clips past this size after each batch."""
+
+
+class RateLimiter:
+    """Token bucket shared by the worker threads."""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.burst, self._tokens + (now - self._updated) * self.rate
+                )
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait_s = (1 - self._tokens) / self.rate
+            time.sleep(wait_s)
+
+
+def _synthesize_one(
+    entry: TTSBatchEntry,
+    key: ClipKey,
+    mp3_path: str,
+    backend: TTSBackend,
+    limiter: RateLimiter,
+    index: TTSCacheIndex,
+    settings: SynthesisSettings,
+):
+    # another process may have cached the clip since we looked; then it's just indexed
+    cache_clip(
+        mp3_path,
+        lambda: synthesize_with_retries(
+            backend,
+            entry.voice,
+            entry.text,
+            retries=settings.retries,
+            before_attempt=limiter.acquire,
+        ),
+    )
+    index.record(key, mp3_path, AudioSegment.from_file(mp3_path, format="mp3"))
+
+
+def tts_batch(
+    entries: Sequence[TTSBatchEntry], settings: SynthesisSettings = SynthesisSettings()
+) -> List[str]:
+    """
+    Cached mp3 for each entry, in order, synthesizing whatever isn't cached yet.
+
+    Entries are collapsed by (voice, normalized text), so repeated prompts (within a
+    deck or across decks) are synthesized once and every entry asking for one gets
+    the same file. Which prompts are cached is answered by one query against the
+    cache index plus one listing of the cache (to notice deleted files); clips
+    already in the cache but not the index are adopted into it. The missing clips
+    are synthesized concurrently, each under a lock shared with other processes, so
+    workers building other decks at the same time never synthesize a clip twice.
+
+    With `settings.cache_max_bytes` set, the cache is then trimmed back to that size,
+    keeping this batch's clips and any clip a cards JSON refers to.
+
+    Every entry needs a voice; TTS services won't pick one.
+    """
+    without_voice = [entry.text for entry in entries if not entry.voice]
+    if without_voice:
+        raise ValueError(
+            f"{len(without_voice)} TTS entries have no voice, eg. {without_voice[0]!r}"
+        )
+
+    keys = [clip_key(entry.voice, entry.text) for entry in entries]
+    unique: Dict[ClipKey, TTSBatchEntry] = {}
+    for key, entry in zip(keys, entries):
+        if key not in unique:
+            text = re.sub("\\s+", " ", entry.text).strip()
+            unique[key] = TTSBatchEntry(voice=entry.voice, text=text)
+
+    index = TTSCacheIndex()
+    indexed = index.lookup(unique)
+    cached = cached_clips()
+
+    mp3_paths: Dict[ClipKey, str] = {}
+    adopted = []
+    missing: Dict[ClipKey, TTSBatchEntry] = {}
+    for key, entry in unique.items():
+        mp3_path = indexed.get(key)
+        if mp3_path is not None and mp3_path in cached:
+            mp3_paths[key] = mp3_path
+            continue
+        mp3_path = mp3_paths[key] = get_mp3_en(entry.voice, entry.text)
+        flat = get_flat_path(os.path.basename(mp3_path))
+        if mp3_path not in cached and flat in cached:
+            # cached before sharding, or by a project writing to the flat layout
+            mp3_path = mp3_paths[key] = flat
+        if mp3_path in cached:
+            adopted.append((key, mp3_path, os.path.getsize(mp3_path), None, None))
+        else:
+            missing[key] = entry
+    if adopted:
+        index.record_many(adopted)
+    index.touch(key for key in mp3_paths if key not in missing)
+
+    if missing:
+        backend = get_tts_backend(settings.backend, settings.timeout_s)
+        limiter = RateLimiter(settings.rate, burst=settings.workers)
+        with ThreadPoolExecutor(
+            max_workers=settings.workers, thread_name_prefix="tts"
+        ) as executor:
+            futures = [
+                executor.submit(
+                    _synthesize_one,
+                    entry,
+                    key,
+                    mp3_paths[key],
+                    backend,
+                    limiter,
+                    index,
+                    settings,
+                )
+                for key, entry in missing.items()
+            ]
+        # raise the first failure, once everything else has had a chance to finish
+        for future in futures:
+            future.result()
+
+    if settings.cache_max_bytes is not None:
+        keep = referenced_clips() | {os.path.basename(p) for p in mp3_paths.values()}
+        evict(index, settings.cache_max_bytes, keep)
+    index.close()
+    return [mp3_paths[key] for key in keys]
@@ -4,16 +4,26 @@ Copied from cherokee-language/audio-lessons-generator-python/tts.py
 from __future__ import annotations
 
 import dataclasses
-import shutil
+from functools import lru_cache
 import boto3
 import hashlib
+import io
 import os
+import random
 import re
 import textwrap
+import threading
+import time
 import unicodedata
+from typing import Callable
 from boto3_type_annotations.polly import Client as Polly
+from botocore.config import Config
+from botocore.exceptions import ClientError, ConnectionError, HTTPClientError
+import numpy as np
 from pydub import AudioSegment
-from pydub import effects
+
+from .locking import cache_clip
+from .pcm_cache import normalized_segment
 
 CACHE_EN = os.path.join("cache", "en")
 
@@ -41,40 +51,207 @@ class TTSBatchEntry:
     text: str = ""
 
 
-def tts_en(voice: str, text_en: str):
+DEFAULT_TIMEOUT_S = 30.0
+POLLY_POOL_CONNECTIONS = 32
+"""Connections kept open to Polly; should be at least the number of TTS workers."""
+
+DEFAULT_RETRIES = 4
+BACKOFF_BASE_S = 0.5
+RETRYABLE_ERROR_CODES = {
+    "Throttling",
+    "ThrottlingException",
+    "TooManyRequestsException",
+    "RequestLimitExceeded",
+    "RequestTimeout",
+    "RequestTimeoutException",
+    "ServiceUnavailable",
+    "ServiceFailureException",
+}
+"""Polly error codes worth another try; other client errors would fail again."""
+
+STUB_LATENCY_S = 0.15
+"""How long the stub backend takes per clip, standing in for a network round trip."""
+
+
+class TTSBackend:
+    """Turns English text into mp3 audio in a given voice."""
+
+    def synthesize(self, voice: str, text: str) -> bytes:
+        raise NotImplementedError()
+
+
+class PollyBackend(TTSBackend):
+    """
+    Amazon Polly, through one client shared by every thread. The client keeps a pool
+    of keep-alive connections, so requests don't each pay for credential lookup and
+    a TLS handshake.
+    """
+
+    def __init__(self, timeout_s: float = DEFAULT_TIMEOUT_S):
+        config = Config(
+            connect_timeout=timeout_s,
+            read_timeout=timeout_s,
+            max_pool_connections=POLLY_POOL_CONNECTIONS,
+            tcp_keepalive=True,
+            # `synthesize_with_retries` retries, with backoff that respects the
+            # caller's rate limit
+            retries={"max_attempts": 0},
+        )
+        self.client: Polly = boto3.Session().client("polly", config=config)
+
+    def synthesize(self, voice: str, text: str) -> bytes:
+        response = self.client.synthesize_speech(
+            OutputFormat="mp3",  #
+            Text=text,  #
+            VoiceId=voice,  #
+            SampleRate=AMZ_HZ,  #
+            LanguageCode="en-US",  #
+            Engine="neural",
+        )
+        return response["AudioStream"].read()
+
+
+class StubBackend(TTSBackend):
+    """
+    Offline stand-in for Polly: a tone whose pitch and length depend only on the
+    voice and text, after a delay like a real request's.
+    """
+
+    def __init__(self, timeout_s: float = DEFAULT_TIMEOUT_S):
+        self.latency_s = min(STUB_LATENCY_S, timeout_s)
+
+    def synthesize(self, voice: str, text: str) -> bytes:
+        time.sleep(self.latency_s)
+        seed = int(hashlib.sha1(f"{voice}:{text}".encode()).hexdigest()[:8], 16)
+        frame_rate = int(AMZ_HZ)
+        duration_s = 0.3 + 0.06 * len(text)
+        t = np.arange(int(frame_rate * duration_s)) / frame_rate
+        samples = 0.3 * np.sin(2 * np.pi * (150 + seed % 300) * t)
+        tone = AudioSegment(
+            (samples * 32767).astype(np.int16).tobytes(),
+            frame_rate=frame_rate,
+            sample_width=2,
+            channels=1,
+        )
+        mp3 = io.BytesIO()
+        tone.export(mp3, format="mp3")
+        return mp3.getvalue()
+
+
+TTS_BACKENDS = {"polly": PollyBackend, "stub": StubBackend}
+
+_backends: dict[tuple[str, float], TTSBackend] = {}
+_backends_lock = threading.Lock()
+
+
+def get_tts_backend(
+    name: str = "polly", timeout_s: float = DEFAULT_TIMEOUT_S
+) -> TTSBackend:
+    """The process-wide backend called `name`, created on first use."""
+    with _backends_lock:
+        if (name, timeout_s) not in _backends:
+            _backends[(name, timeout_s)] = TTS_BACKENDS[name](timeout_s)
+        return _backends[(name, timeout_s)]
+
+
+def is_retryable(error: Exception) -> bool:
+    """Whether a failed request was throttled, timed out, or hit a server error."""
+    if isinstance(error, ClientError):
+        code = error.response.get("Error", {}).get("Code", "")
+        status = error.response.get("ResponseMetadata", {}).get("HTTPStatusCode", 0)
+        return code in RETRYABLE_ERROR_CODES or status >= 500
+    return isinstance(error, (ConnectionError, HTTPClientError))
+
+
+def synthesize_with_retries(
+    backend: TTSBackend,
+    voice: str,
+    text: str,
+    retries: int = DEFAULT_RETRIES,
+    before_attempt: Callable[[], None] | None = None,
+) -> bytes:
+    """
+    `backend.synthesize`, retrying throttled and failed requests with exponential
+    backoff. Every caller goes through here, since the Polly client doesn't retry
+    on its own. Requests Polly rejects, like text that's too long, aren't retried.
+    """
+    attempt = 0
+    while True:
+        if before_attempt is not None:
+            before_attempt()
+        try:
+            return backend.synthesize(voice, text)
+        except Exception as e:
+            if attempt == retries or not is_retryable(e):
+                raise
+        # jitter, so throttled workers don't retry in step
+        time.sleep(BACKOFF_BASE_S * 2**attempt * random.uniform(0.5, 1.5))
+        attempt += 1
+
+
+def tts_en(voice: str, text_en: str, backend: TTSBackend | None = None) -> str:
+    """Path of the cached clip, synthesizing it first if it isn't cached."""
     mp3_en = get_mp3_en(voice, text_en)
     if os.path.exists(mp3_en):
-        return
-    polly_client: Polly = boto3.Session().client("polly")
-    response = polly_client.synthesize_speech(
-        OutputFormat="mp3",  #
-        Text=text_en,  #
-        VoiceId=voice,  #
-        SampleRate=AMZ_HZ,  #
-        LanguageCode="en-US",  #
-        Engine="neural",
+        return mp3_en
+    flat = get_flat_path(os.path.basename(mp3_en))
+    if os.path.exists(flat):
+        return flat
+    cache_clip(
+        mp3_en,
+        lambda: synthesize_with_retries(backend or get_tts_backend(), voice, text_en),
     )
-    with open(mp3_en + ".tmp", "wb") as w:
-        w.write(response["AudioStream"].read())
-    shutil.move(mp3_en + ".tmp", mp3_en)
+    return mp3_en
 
 
 def get_mp3_en(voice: str, text_en: str) -> str:
+    """Where the clip belongs in the cache. It may still be at its flat path instead."""
     text_en = re.sub("\\s+", " ", text_en).strip()
     mp3_name_en: str = get_filename(voice, text_en)
-    mp3_en: str = os.path.join(CACHE_EN, mp3_name_en)
-    return mp3_en
+    return get_sharded_path(mp3_name_en)
+
+
+def get_shard(filename: str) -> str:
+    """Cache subdirectory for a clip: the first two characters of its text's sha1."""
+    return os.path.splitext(filename)[0].rsplit("_", 1)[-1][:2]
+
+
+def get_sharded_path(filename: str) -> str:
+    return os.path.join(CACHE_EN, get_shard(filename), filename)
+
+
+def get_flat_path(filename: str) -> str:
+    """
+    Where clips were cached before sharding. Projects sharing the cache (like
+    audio-lessons-generator-python) still read and write clips here.
+    """
+    return os.path.join(CACHE_EN, filename)
+
+
+def get_cache_path(filename: str) -> str:
+    """
+    Where the clip called `filename` is cached: its shard, or else its flat path.
+    Bulk lookups should go through the cache index instead of probing each clip.
+    """
+    sharded = get_sharded_path(filename)
+    if os.path.exists(sharded):
+        return sharded
+    flat = get_flat_path(filename)
+    return flat if os.path.exists(flat) else sharded
 
 
 def en_audio(voice: str, text_en: str) -> AudioSegment:
-    tts_en(voice, text_en)
-    mp3_file = get_mp3_en(voice, text_en)
-    return effects.normalize(AudioSegment.from_file(mp3_file))
+    return normalized_segment(tts_en(voice, text_en))
+
+
+@lru_cache(maxsize=1 << 16)
+def normalize_tts_text(text: str) -> str:
+    """Text as it's identified in the cache: whitespace collapsed, lowercase."""
+    return re.sub("\\s+", " ", textwrap.dedent(text)).strip().lower()
 
 
 def get_filename(voice: str, text: str, alpha: float | None = None):
-    text = re.sub("\\s+", " ", textwrap.dedent(text)).strip()
-    text = text.lower()
+    text = normalize_tts_text(text)
     if not voice:
         voice = "-"
     if alpha and alpha != 1.0:
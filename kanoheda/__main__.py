@@ -4,30 +4,60 @@ from pathlib import Path
 
 from pydub import AudioSegment
 
-from common.annotations import read_annotations_tsv, read_annotations_tsv_from_path
+from common.annotations import (
+    AnnotationTable,
+    ensure_split_audio_exists_for_annotations,
+)
+from common.manifest import BuildManifest, digest, file_fingerprint
 from common.online_exercises_structs import (
     OnlineExercisesCard,
     write_cards_json_for_dataset,
 )
 from common.structs import DatasetMetadata
 from common.terms import read_terms_for_dataset
-from generate_english_audio.generate_english_audio_for_deck import (
-    generate_audio_for_voice,
-)
-from generate_english_audio.tts import AMZ_VOICES_FEMALE
+from generate_english_audio.synthesis import SynthesisSettings, tts_batch
+from generate_english_audio.tts import AMZ_VOICES_FEMALE, TTSBatchEntry
+
+
+KANOHEDA_STAGE = "kanoheda"
+LESSON_AUDIO = Path("test.mp3")
 
 
-def main(dataset_folder: Path):
+def main(
+    dataset_folder: Path,
+    jobs: int,
+    synthesis: SynthesisSettings = SynthesisSettings(),
+):
     dataset = DatasetMetadata.from_file(dataset_folder / "dataset.json")
 
-    cherokee_annotations = list(read_annotations_tsv(dataset))
+    # skip rendering the lesson again if none of its inputs changed
+    manifest = BuildManifest.for_dataset(dataset)
+    inputs = digest(
+        [
+            file_fingerprint(path)
+            for path in (
+                dataset.terms,
+                dataset.annotations,
+                dataset.english_annotations,
+                dataset.audio_source,
+                dataset.english_audio_source,
+            )
+        ],
+        dataset.annotation_tier,
+        dataset.english_annotation_tier,
+        str(LESSON_AUDIO),
+    )
+    if manifest.is_current(KANOHEDA_STAGE, dataset.collection_id, inputs):
+        return
+
+    cherokee_annotations = AnnotationTable.for_dataset(dataset)
 
     if dataset.english_annotations:
-        english_annotations = list(
-            read_annotations_tsv_from_path(dataset.english_annotations)
+        english_annotations = AnnotationTable.from_path(
+            dataset.english_annotations, dataset.english_annotation_tier
         )
     else:
-        english_annotations = []
+        english_annotations = AnnotationTable.from_rows([])
 
     terms = list(read_terms_for_dataset(dataset))
 
@@ -35,55 +65,64 @@ def main(dataset_folder: Path):
         cherokee_annotations
     ), "Expected the same number of terms and Cherokee annotations"
 
-    audio_source: AudioSegment = AudioSegment.from_file(dataset.audio_source)
-    if dataset.english_audio_source:
-        english_audio_source: AudioSegment = AudioSegment.from_file(
-            dataset.english_audio_source
-        )
-    else:
-        english_audio_source: AudioSegment = audio_source
+    matched_annotations = []
+    for term in terms:
+        cherokee_annotation = cherokee_annotations.first_with_text(term.syllabary)
+        english_annotation = english_annotations.first_with_text(term.english)
 
-    output_audio: AudioSegment = AudioSegment.empty()
+        assert cherokee_annotation, (
+            "Must have Cherokee audio for all terms: " + term.syllabary
+        )
+        matched_annotations.append((term, cherokee_annotation, english_annotation))
 
     # ensure we have a place to put audio
     os.makedirs(dataset.audio_output_dir, exist_ok=True)
-    cards = []
 
-    for term in terms:
-        cherokee_annotation = next(
-            (
-                a
-                for a in cherokee_annotations
-                if a.annotation_text.strip() == term.syllabary.strip()
-            ),
-            None,
-        )
-        english_annotation = next(
-            (
-                a
-                for a in english_annotations
-                if a.annotation_text.strip() == term.english.strip()
-            ),
-            None,
+    cherokee_audio_paths = ensure_split_audio_exists_for_annotations(
+        dataset,
+        [cherokee_annotation for _, cherokee_annotation, _ in matched_annotations],
+        jobs=jobs,
+    )
+    english_audio_paths = ensure_split_audio_exists_for_annotations(
+        dataset,
+        [
+            english_annotation
+            for _, _, english_annotation in matched_annotations
+            if english_annotation
+        ],
+        audio_source_path=dataset.english_audio_source or dataset.audio_source,
+        jobs=jobs,
+    )
+    english_audio_paths_iter = iter(english_audio_paths)
+    # TTS for terms without recorded English
+    tts_audio_paths_iter = iter(
+        tts_batch(
+            [
+                TTSBatchEntry(voice=AMZ_VOICES_FEMALE[0], text=term.english)
+                for term, _, english_annotation in matched_annotations
+                if not english_annotation
+            ],
+            synthesis,
         )
+    )
 
-        assert cherokee_annotation, (
-            "Must have Cherokee audio for all terms: " + term.syllabary
-        )
-        cherokee_annotation.ensure_split_audio_exists(dataset, audio_source)
-        cherokee_sentence_audio_path = cherokee_annotation.split_audio_path(dataset)
+    output_audio: AudioSegment = AudioSegment.empty()
+    cards = []
+
+    for (
+        term,
+        cherokee_annotation,
+        english_annotation,
+    ), cherokee_sentence_audio_path in zip(matched_annotations, cherokee_audio_paths):
         cherokee_sentence_audio: AudioSegment = AudioSegment.from_file(
             cherokee_sentence_audio_path
         )
 
         if english_annotation:
-            english_annotation.ensure_split_audio_exists(dataset, english_audio_source)
-            english_sentence_audio_path = english_annotation.split_audio_path(dataset)
+            english_sentence_audio_path = next(english_audio_paths_iter)
 
         else:
-            english_sentence_audio_path = generate_audio_for_voice(
-                voice=AMZ_VOICES_FEMALE[0], text=term.english
-            )
+            english_sentence_audio_path = next(tts_audio_paths_iter)
 
         english_sentence_audio: AudioSegment = AudioSegment.from_file(
             english_sentence_audio_path
@@ -118,7 +157,15 @@ def main(dataset_folder: Path):
         )
 
     write_cards_json_for_dataset(dataset, cards)
-    output_audio.export("test.mp3", format="mp3", parameters=["-qscale:a", "0"])
+    output_audio.export(LESSON_AUDIO, format="mp3", parameters=["-qscale:a", "0"])
+
+    manifest.record(
+        KANOHEDA_STAGE,
+        dataset.collection_id,
+        inputs,
+        outputs=[dataset.cards_json, LESSON_AUDIO],
+    )
+    manifest.save()
 
 
 if __name__ == "__main__":
@@ -130,6 +177,12 @@ if __name__ == "__main__":
         type=str,
         help="Path to folder containing dataset, eg. `data/jw-living-phrases`",
     )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Number of processes used to extract split audio (default: number of CPUs).",
+    )
     # parser.add_argument(
     #     "--export-json",
     #     action=argparse.BooleanOptionalAction,
@@ -138,4 +191,4 @@ if __name__ == "__main__":
     # )
 
     args = parser.parse_args()
-    main(dataset_folder=Path(args.dataset_folder))
+    main(dataset_folder=Path(args.dataset_folder), jobs=args.jobs)
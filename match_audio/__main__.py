@@ -1,72 +1,223 @@
 import argparse
+import itertools
 import os
 import re
 from pathlib import Path
-from csv import DictWriter
-from dataclasses import asdict
-
-from pydub import AudioSegment
-from pydub.playback import play
+from typing import Optional
 
 from common.structs import DatasetMetadata
 
-from .matching import get_matchable_audio_from_annotations, top_n_matches
+from .assignment import (
+    AUTO_MATCH_FLAG,
+    LOW_CONFIDENCE_THRESHOLD,
+    assign,
+    similarity_matrix,
+)
+from .journal import MatchJournal
+from .library import AudioLibrary, LibraryAudio
+from .matching import MatchIndex, get_matchable_audio_from_annotations
+from .preview import PreviewEngine
 
-from common.terms import TERM_FIELDS, read_terms_for_dataset
+from common.terms import read_terms_for_dataset, write_terms_for_dataset
 from common.online_exercises_structs import export_terms_to_json
 
 
+LIBRARY_CANDIDATES = 3
+"""Number of recordings from other datasets offered alongside a dataset's own."""
+
+
 def text_to_path(text: str):
     return re.sub(r"[^0-9a-zA-Z]+", "_", text)
 
 
-def match_segments_and_extract_audio(dataset: DatasetMetadata) -> None:
-    audio_source: AudioSegment = AudioSegment.from_wav(dataset.audio_source)
+def match_segments_and_extract_audio(
+    dataset: DatasetMetadata,
+    jobs: int,
+    library: Optional[AudioLibrary] = None,
+    rescore: bool = False,
+    review: bool = False,
+) -> None:
+    """
+    Interactively pick audio for each unmatched term. With a `library`, existing
+    recordings from other datasets are offered after the dataset's own annotations.
+    With `review`, go through the terms `--auto` flagged instead, offering the audio
+    it picked first.
 
+    Every choice is appended to a journal straight away. If the session is interrupted
+    it resumes from the journal on the next run, and the terms CSV is only rewritten
+    (in one pass) once every term has been seen.
+    """
     os.makedirs(dataset.audio_output_dir, exist_ok=True)
 
-    available_cherokee_audio = get_matchable_audio_from_annotations(
-        dataset, audio_source
+    terms = list(read_terms_for_dataset(dataset))
+    journal = MatchJournal(dataset.match_journal)
+    resumed = 0
+    for row, entry in journal.read().items():
+        if row < len(terms) and terms[row].cherokee == entry.cherokee:
+            terms[row].audio = entry.audio
+            terms[row].has_problems = entry.has_problems
+            resumed += 1
+    if resumed:
+        print(f"Resuming session with {resumed} matches from {journal.path}")
+
+    available_cherokee_audio = MatchIndex(
+        get_matchable_audio_from_annotations(dataset, jobs=jobs)
     )
 
-    with open(dataset.new_terms, "w") as f:
-        writer = DictWriter(f, fieldnames=TERM_FIELDS, delimiter=",")
-        for term in read_terms_for_dataset(dataset):
-            if term.audio == "" and term.has_problems == "":
-                matches = top_n_matches(term.cherokee, available_cherokee_audio, n=5)
+    if review:
+        pending = [
+            row
+            for row, term in enumerate(terms)
+            if term.has_problems == AUTO_MATCH_FLAG
+        ]
+    else:
+        pending = [
+            row
+            for row, term in enumerate(terms)
+            if term.audio == "" and term.has_problems == ""
+        ]
+    audio_by_file = {str(audio.file): audio for audio in available_cherokee_audio.audio}
+    candidates = {}
+
+    def top_matches(row: int):
+        if row not in candidates:
+            matches = available_cherokee_audio.top_n(
+                terms[row].cherokee, n=5, rescore=rescore
+            )
+            auto_matched = audio_by_file.get(terms[row].audio)
+            if review and auto_matched is not None:
+                matches = [auto_matched] + [
+                    match for match in matches if match is not auto_matched
+                ]
+            if library is not None:
+                files = {match.file for match in matches}
+                matches.extend(
+                    itertools.islice(
+                        (
+                            audio
+                            for audio in library.top_n(terms[row].cherokee, n=20)
+                            if audio.dataset != dataset.collection_id
+                            and audio.file not in files
+                        ),
+                        LIBRARY_CANDIDATES,
+                    )
+                )
+            candidates[row] = matches
+        return candidates[row]
+
+    with PreviewEngine() as preview:
+        try:
+            for position, row in enumerate(pending):
+                term = terms[row]
+                matches = top_matches(row)
+                del candidates[row]
+                # decode this term's candidates first, then the next term's
+                preview.prefetch(match.file for match in matches)
+                if position + 1 < len(pending):
+                    preview.prefetch(
+                        match.file for match in top_matches(pending[position + 1])
+                    )
+
                 accepted = False
                 while not accepted:
                     print(f"Term: {term.cherokee} ({term.english})")
                     for i, match in enumerate(matches):
-                        print(f"{i}) {match.cherokee}")
+                        if isinstance(match, LibraryAudio):
+                            print(f"{i}) {match.cherokee} [{match.dataset}]")
+                        else:
+                            print(f"{i}) {match.cherokee}")
 
                     selected = input("Selected match: ")
                     try:
                         if selected.endswith("?"):
                             selected_idx = int(selected[:-1])
                             selected_match = matches[selected_idx]
-                            play(AudioSegment.from_file(selected_match.file))
+                            preview.play(selected_match.file)
                         elif selected == "":
                             accepted = True
+                            term.audio = ""
                             term.has_problems = "*"
                         else:
-                            accepted = True
                             selected_idx = int(selected)
                             selected_match = matches[selected_idx]
                             term.audio = str(selected_match.file)
-                    except:
+                            term.has_problems = ""
+                            accepted = True
+                    except Exception:
                         print("Not understood")
 
-            writer.writerow(asdict(term))
+                journal.append(row, term)
+        except (KeyboardInterrupt, EOFError):
+            journal.close()
+            print(f"\nProgress saved to {journal.path}; run again to resume.")
+            raise SystemExit(1)
 
-    # write terms to backup; new file to terms
-    dataset.terms.rename(dataset.backup_terms)
-    dataset.new_terms.rename(dataset.terms)
+    write_terms_for_dataset(dataset, terms)
+    journal.remove()
+
+
+def auto_match_segments_and_extract_audio(dataset: DatasetMetadata, jobs: int) -> None:
+    """
+    Match every unmatched term at once, giving each annotation to at most one term.
+    Low-confidence and unmatched terms are flagged in `has_problems` for review.
+    """
+    os.makedirs(dataset.audio_output_dir, exist_ok=True)
+
+    terms = list(read_terms_for_dataset(dataset))
+    already_used = {term.audio for term in terms if term.audio != ""}
+    available_cherokee_audio = MatchIndex(
+        [
+            audio
+            for audio in get_matchable_audio_from_annotations(dataset, jobs=jobs)
+            if str(audio.file) not in already_used
+        ]
+    )
+
+    unmatched = [term for term in terms if term.audio == "" and term.has_problems == ""]
+    assignment = assign(
+        similarity_matrix(
+            [term.cherokee for term in unmatched], available_cherokee_audio
+        ),
+        len(unmatched),
+    )
+
+    flagged = 0
+    for term, (candidate, score) in zip(unmatched, assignment):
+        if candidate is not None:
+            term.audio = str(available_cherokee_audio.audio[candidate].file)
+        if candidate is None or score < LOW_CONFIDENCE_THRESHOLD:
+            term.has_problems = AUTO_MATCH_FLAG
+            flagged += 1
+
+    write_terms_for_dataset(dataset, terms)
+    print(
+        f"Matched {len(unmatched)} terms, {flagged} flagged with "
+        f"'{AUTO_MATCH_FLAG}' for review"
+    )
 
 
-def main(dataset_folder: Path, export_json: bool):
+def main(
+    dataset_folder: Path,
+    export_json: bool,
+    jobs: int,
+    auto: bool,
+    library: bool,
+    rescore: bool,
+    review: bool,
+):
     dataset = DatasetMetadata.from_file(dataset_folder / "dataset.json")
-    match_segments_and_extract_audio(dataset)
+    if auto:
+        auto_match_segments_and_extract_audio(dataset, jobs=jobs)
+    else:
+        match_segments_and_extract_audio(
+            dataset,
+            jobs=jobs,
+            library=AudioLibrary.from_data_folder(dataset_folder.parent)
+            if library
+            else None,
+            rescore=rescore,
+            review=review,
+        )
     if export_json:
         export_terms_to_json(dataset)
 
@@ -86,6 +237,44 @@ if __name__ == "__main__":
         default=False,
         help="Export a JSON file for the online exercises site (will not contain English audio).",
     )
+    parser.add_argument(
+        "--auto",
+        action=argparse.BooleanOptionalAction,
+        default=False,
+        help=f"Match all terms without prompting, flagging matches scoring below {LOW_CONFIDENCE_THRESHOLD} for review.",
+    )
+    parser.add_argument(
+        "--review",
+        action=argparse.BooleanOptionalAction,
+        default=False,
+        help=f"Go through the matches `--auto` flagged with '{AUTO_MATCH_FLAG}' instead of unmatched terms.",
+    )
+    parser.add_argument(
+        "--library",
+        action=argparse.BooleanOptionalAction,
+        default=False,
+        help="Also offer existing recordings from the other datasets in the data folder.",
+    )
+    parser.add_argument(
+        "--rescore",
+        action=argparse.BooleanOptionalAction,
+        default=False,
+        help="Re-rank candidates by a weighted edit distance, which helps with short terms.",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Number of processes used to extract split audio (default: number of CPUs).",
+    )
 
     args = parser.parse_args()
-    main(dataset_folder=Path(args.dataset_folder), export_json=args.export_json)
+    main(
+        dataset_folder=Path(args.dataset_folder),
+        export_json=args.export_json,
+        jobs=args.jobs,
+        auto=args.auto,
+        library=args.library,
+        rescore=args.rescore,
+        review=args.review,
+    )
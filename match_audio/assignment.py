@@ -0,0 +1,107 @@
+"""
+Python module for matching a whole terms CSV against the available audio at once,
+without a reviewer.
+"""
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+
+from common.phonetics import MINIFIED
+
+from .matching import MatchIndex, trigrams
+
+LOW_CONFIDENCE_THRESHOLD = 0.5
+"""Matches scoring below this are flagged for a human to review."""
+
+AUTO_MATCH_FLAG = "?"
+"""Value written to `TermRow.has_problems` for matches that need review."""
+
+
+@dataclass
+class SparseSimilarity:
+    """Nonzero entries of a term × candidate similarity matrix, in COO form."""
+
+    terms: np.ndarray
+    candidates: np.ndarray
+    scores: np.ndarray
+
+
+def similarity_matrix(targets: List[str], index: MatchIndex) -> SparseSimilarity:
+    """
+    Trigram Jaccard similarity between every target and every candidate in `index`
+    that shares a trigram with it, computed in one vectorized pass.
+    """
+    trigram_ids: Dict[Tuple[str, str, str], int] = {
+        trigram: i for i, trigram in enumerate(index.postings)
+    }
+
+    # CSR layout of the index's posting lists
+    posting_lengths = np.array(
+        [len(postings) for postings in index.postings.values()], dtype=np.int64
+    )
+    posting_starts = np.concatenate([[0], np.cumsum(posting_lengths)])
+    posting_candidates = np.fromiter(
+        (i for postings in index.postings.values() for i in postings),
+        dtype=np.int64,
+        count=int(posting_starts[-1]),
+    )
+    candidate_sizes = np.array(
+        [len(trigram_set) for trigram_set in index.trigram_sets], dtype=np.int64
+    )
+
+    # (term, trigram) pairs for every trigram of every target that some candidate has
+    query_sizes = np.zeros(len(targets), dtype=np.int64)
+    pair_terms: List[int] = []
+    pair_trigrams: List[int] = []
+    minified = MINIFIED.batch(target.lower() for target in targets)
+    for term, target in enumerate(minified):
+        query = set(trigrams(target))
+        query_sizes[term] = len(query)
+        for trigram in query:
+            trigram_id = trigram_ids.get(trigram)
+            if trigram_id is not None:
+                pair_terms.append(term)
+                pair_trigrams.append(trigram_id)
+    pair_terms_array = np.array(pair_terms, dtype=np.int64)
+    pair_trigrams_array = np.array(pair_trigrams, dtype=np.int64)
+
+    # expand each (term, trigram) pair into (term, candidate) for its posting list
+    counts = posting_lengths[pair_trigrams_array]
+    terms = np.repeat(pair_terms_array, counts)
+    firsts = np.repeat(posting_starts[pair_trigrams_array], counts)
+    within = np.arange(len(terms)) - np.repeat(np.cumsum(counts) - counts, counts)
+    candidates = posting_candidates[firsts + within]
+
+    # number of shared trigrams for each (term, candidate)
+    n_candidates = max(1, len(index.audio))
+    keys, shared = np.unique(terms * n_candidates + candidates, return_counts=True)
+    terms, candidates = np.divmod(keys, n_candidates)
+    scores = shared / (query_sizes[terms] + candidate_sizes[candidates] - shared)
+
+    return SparseSimilarity(terms=terms, candidates=candidates, scores=scores)
+
+
+def assign(
+    similarity: SparseSimilarity, n_terms: int
+) -> List[Tuple[Optional[int], float]]:
+    """
+    One-to-one assignment of candidates to terms with the highest total similarity.
+    Only candidates sharing a trigram with some term take part, so the problem is
+    solved on that (usually much smaller) submatrix. Returns (candidate, score) for
+    each term, with `None` for terms left without a candidate.
+    """
+    assignment: List[Tuple[Optional[int], float]] = [(None, 0.0)] * n_terms
+    if len(similarity.scores) == 0:
+        return assignment
+
+    columns, column_of_edge = np.unique(similarity.candidates, return_inverse=True)
+    scores = np.zeros((n_terms, len(columns)))
+    scores[similarity.terms, column_of_edge] = similarity.scores
+    rows, cols = linear_sum_assignment(scores, maximize=True)
+    for term, column in zip(rows, cols):
+        # pairs without a shared trigram only fill out the assignment
+        if scores[term, column] > 0:
+            assignment[int(term)] = (int(columns[column]), float(scores[term, column]))
+    return assignment
@@ -0,0 +1,241 @@
+"""
+Benchmark for matching terms to annotations, using terms that were already matched by
+hand as ground truth.
+
+Run with `python -m match_audio.benchmark`. Every matcher sees the same cases: each
+dataset's own annotations, then the same annotations hidden among synthetic
+distractors built from their words, so throughput and accuracy can be compared at
+sizes like the full dictionary's.
+"""
+import argparse
+from dataclasses import dataclass
+from functools import partial
+import random
+import re
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from common.annotations import cherokee_annotations
+from common.structs import DatasetMetadata
+from common.terms import read_terms_for_dataset
+
+from .library import AudioLibrary, LibraryAudio
+from .matching import MatchableAudio, MatchIndex, top_n_matches
+
+TopN = Callable[[str, int], List[MatchableAudio]]
+
+SPLIT_AUDIO_TIMES = re.compile(r"_(\d+)_(\d+)\.mp3$")
+
+DEFAULT_DATASETS = [Path("data/jw-living-phrases"), Path("data/jw-conjugations")]
+DEFAULT_SCALES = [10_000, 100_000]
+
+
+@dataclass
+class BenchmarkCase:
+    name: str
+    available: List[MatchableAudio]
+    queries: List[Tuple[str, Path]]  # (term, file of the annotation it was matched to)
+
+
+@dataclass
+class BenchmarkResult:
+    case: str
+    matcher: str
+    candidates: int
+    build_s: float
+    queries_per_s: float
+    p50_ms: float
+    p99_ms: float
+    build_peak_mib: float
+    query_peak_mib: float
+    """Memory allocated while answering queries, on top of the built matcher."""
+
+    top_1: float
+    top_5: float
+
+
+def list_top_n(available: List[MatchableAudio]) -> TopN:
+    """`top_n_matches` as callers holding a plain list use it, indexing every query."""
+    return lambda target_cherokee, n: top_n_matches(target_cherokee, available, n)
+
+
+def library_top_n(available: List[MatchableAudio]) -> TopN:
+    return AudioLibrary(
+        [LibraryAudio(a.cherokee, a.file, dataset="benchmark") for a in available]
+    ).top_n
+
+
+MATCHERS: Dict[str, Callable[[List[MatchableAudio]], TopN]] = {
+    "top_n_matches": list_top_n,
+    "index": lambda available: MatchIndex(available).top_n,
+    "rescored": lambda available: partial(MatchIndex(available).top_n, rescore=True),
+    "library": library_top_n,
+}
+
+
+def _split_audio_times(path: str) -> Optional[Tuple[int, int]]:
+    match = SPLIT_AUDIO_TIMES.search(path)
+    return None if match is None else (int(match[1]), int(match[2]))
+
+
+def case_for_dataset(dataset: DatasetMetadata) -> BenchmarkCase:
+    """
+    Annotations of a dataset, and each hand-matched term with the annotation it was
+    given. Annotations are sometimes nudged after matching, so a term's answer is the
+    annotation overlapping its split audio the most rather than one with the exact
+    same times.
+    """
+    annotations = list(cherokee_annotations(dataset))
+    available = [
+        MatchableAudio(annotation.annotation_text, annotation.split_audio_path(dataset))
+        for annotation in annotations
+    ]
+    starts = np.array([annotation.start_ms for annotation in annotations])
+    ends = np.array([annotation.end_ms for annotation in annotations])
+
+    queries: List[Tuple[str, Path]] = []
+    for term in read_terms_for_dataset(dataset):
+        times = _split_audio_times(term.audio)
+        if term.has_problems != "" or times is None or len(annotations) == 0:
+            continue
+        overlap = np.minimum(ends, times[1]) - np.maximum(starts, times[0])
+        best = int(np.argmax(overlap))
+        if overlap[best] > 0:
+            queries.append((term.cherokee, available[best].file))
+
+    return BenchmarkCase(dataset.collection_id, available, queries)
+
+
+def scaled_case(case: BenchmarkCase, size: int, seed: int) -> BenchmarkCase:
+    """
+    `case` with synthetic distractors added until there are `size` annotations.
+    Distractors are 1-4 of the case's own words, with the odd letter changed, so
+    they share plenty of trigrams with the real annotations.
+    """
+    rng = random.Random(seed)
+    words = [word for audio in case.available for word in audio.cherokee.split()]
+    letters = sorted({letter for word in words for letter in word})
+    available = list(case.available)
+    for i in range(max(0, size - len(available))):
+        phrase = list(" ".join(rng.choices(words, k=rng.randint(1, 4))))
+        for _ in range(rng.randint(0, 2)):
+            phrase[rng.randrange(len(phrase))] = rng.choice(letters)
+        available.append(
+            MatchableAudio("".join(phrase), Path(f"synthetic/{case.name}_{i}.mp3"))
+        )
+    rng.shuffle(available)
+    return BenchmarkCase(f"{case.name}@{size}", available, case.queries)
+
+
+def run(case: BenchmarkCase, matcher: str) -> BenchmarkResult:
+    build = MATCHERS[matcher]
+
+    tracemalloc.start()
+    top_n = build(case.available)
+    built, build_peak = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    for term, _ in case.queries:
+        top_n(term, 5)
+    _, query_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    # timed separately, since tracing slows everything down
+    started = time.perf_counter()
+    top_n = build(case.available)
+    build_s = time.perf_counter() - started
+
+    latencies = []
+    top_1 = top_5 = 0
+    for term, expected in case.queries:
+        started = time.perf_counter()
+        matches = top_n(term, 5)
+        latencies.append(time.perf_counter() - started)
+        files = [match.file for match in matches]
+        top_1 += files[:1] == [expected]
+        top_5 += expected in files
+
+    n = max(1, len(case.queries))
+    return BenchmarkResult(
+        case=case.name,
+        matcher=matcher,
+        candidates=len(case.available),
+        build_s=build_s,
+        queries_per_s=len(latencies) / max(sum(latencies), 1e-9),
+        p50_ms=1000 * float(np.percentile(latencies, 50)) if latencies else 0.0,
+        p99_ms=1000 * float(np.percentile(latencies, 99)) if latencies else 0.0,
+        build_peak_mib=build_peak / 2**20,
+        query_peak_mib=(query_peak - built) / 2**20,
+        top_1=top_1 / n,
+        top_5=top_5 / n,
+    )
+
+
+def print_results(results: List[BenchmarkResult]):
+    header = f"{'case':<28} {'matcher':<13} {'annotations':>11} {'build s':>8} {'q/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'build MiB':>9} {'query MiB':>9} {'top-1':>6} {'top-5':>6}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(
+            f"{r.case:<28} {r.matcher:<13} {r.candidates:>11} {r.build_s:>8.2f} {r.queries_per_s:>9.1f} {r.p50_ms:>8.2f} {r.p99_ms:>8.2f} {r.build_peak_mib:>9.1f} {r.query_peak_mib:>9.1f} {r.top_1:>6.1%} {r.top_5:>6.1%}"
+        )
+
+
+def main(
+    dataset_folders: List[Path], scales: List[int], matchers: List[str], seed: int
+):
+    results = []
+    for dataset_folder in dataset_folders:
+        dataset = DatasetMetadata.from_file(dataset_folder / "dataset.json")
+        case = case_for_dataset(dataset)
+        print(f"{case.name}: {len(case.queries)} hand-matched terms")
+        for scaled in [case] + [scaled_case(case, size, seed) for size in scales]:
+            for matcher in matchers:
+                results.append(run(scaled, matcher))
+    print()
+    print_results(results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        "match_audio.benchmark",
+        description="Measure speed and accuracy of matchers against hand-matched terms",
+    )
+    parser.add_argument(
+        "dataset_folders",
+        type=str,
+        nargs="*",
+        default=[str(folder) for folder in DEFAULT_DATASETS],
+        help="Datasets whose terms CSV already has audio (default: the JW datasets).",
+    )
+    parser.add_argument(
+        "--scales",
+        type=int,
+        nargs="*",
+        default=DEFAULT_SCALES,
+        help="Also run with distractors added up to each of these numbers of annotations.",
+    )
+    parser.add_argument(
+        "--matchers",
+        nargs="*",
+        choices=list(MATCHERS),
+        default=list(MATCHERS),
+        help="Matchers to compare (default: all).",
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=0,
+        help="Seed for the synthetic distractors.",
+    )
+
+    args = parser.parse_args()
+    main(
+        dataset_folders=[Path(folder) for folder in args.dataset_folders],
+        scales=args.scales,
+        matchers=args.matchers,
+        seed=args.seed,
+    )
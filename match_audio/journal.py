@@ -0,0 +1,65 @@
+"""
+Crash-safe record of the matches accepted during an interactive `match_audio` session.
+"""
+from dataclasses import dataclass
+import json
+import os
+from pathlib import Path
+from typing import Dict
+
+from common.terms import TermRow
+
+
+@dataclass
+class JournalEntry:
+    row: int  # index of the row in the terms CSV
+    cherokee: str  # to check the row hasn't moved since
+    audio: str
+    has_problems: str
+
+
+class MatchJournal:
+    """
+    Append-only log of accepted matches. Every entry is flushed and fsynced as soon as
+    it is written, so a crash or Ctrl-C loses at most the match being typed.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._file = None
+
+    def read(self) -> Dict[int, JournalEntry]:
+        """Entries by row. A line cut short by a crash is ignored."""
+        entries: Dict[int, JournalEntry] = {}
+        if not self.path.exists():
+            return entries
+        with open(self.path) as f:
+            for line in f:
+                try:
+                    entry = JournalEntry(**json.loads(line))
+                except (json.JSONDecodeError, TypeError):
+                    continue
+                entries[entry.row] = entry
+        return entries
+
+    def append(self, row: int, term: TermRow):
+        if self._file is None:
+            self._file = open(self.path, "a")
+        entry = JournalEntry(
+            row=row,
+            cherokee=term.cherokee,
+            audio=term.audio,
+            has_problems=term.has_problems,
+        )
+        self._file.write(json.dumps(entry.__dict__, ensure_ascii=False) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def remove(self):
+        self.close()
+        self.path.unlink(missing_ok=True)
@@ -0,0 +1,84 @@
+"""
+Python module for finding existing recordings of a term in any dataset, so audio
+recorded or cut for one collection can be reused by another.
+"""
+from dataclasses import dataclass
+import heapq
+from pathlib import Path
+from typing import Iterator, List, Set
+
+from common.annotations import cherokee_annotations
+from common.online_exercises_structs import read_cards_for_dataset
+from common.phonetics import MINIFIED
+from common.structs import DatasetMetadata
+
+from .matching import MatchableAudio, MatchIndex
+
+
+@dataclass
+class LibraryAudio(MatchableAudio):
+    dataset: str  # collection id of the dataset the audio came from
+
+
+class AudioLibrary:
+    """
+    Trigram index over the phonetics of every recording in every dataset, each file
+    indexed once.
+
+    Lookups score entries the way `MatchIndex` does, but only return entries that
+    share a trigram with the term rather than padding with unrelated recordings.
+    """
+
+    def __init__(self, audio: List[LibraryAudio]):
+        entries: List[LibraryAudio] = []
+        seen_files: Set[Path] = set()
+        for entry in audio:
+            if entry.file not in seen_files:
+                entries.append(entry)
+                seen_files.add(entry.file)
+        self.audio = entries
+        self.index = MatchIndex(entries)
+
+    @staticmethod
+    def from_datasets(datasets: List[DatasetMetadata]) -> "AudioLibrary":
+        return AudioLibrary([audio for d in datasets for audio in library_audio(d)])
+
+    @staticmethod
+    def from_data_folder(data_folder: Path = Path("data")) -> "AudioLibrary":
+        return AudioLibrary.from_datasets(
+            [
+                DatasetMetadata.from_file(path)
+                for path in sorted(data_folder.glob("*/dataset.json"))
+            ]
+        )
+
+    def top_n(self, target_cherokee: str, n: int) -> List[LibraryAudio]:
+        scores = self.index.scores(target_cherokee)
+        best = heapq.nsmallest(n, scores, key=lambda i: (-scores[i], i))
+        return [self.audio[i] for i in best]
+
+
+def library_audio(dataset: DatasetMetadata) -> Iterator[LibraryAudio]:
+    """
+    Existing recordings in a dataset: the Cherokee audio on its exported cards, and
+    any split audio already cut for its annotations. Nothing is re-cut.
+    """
+    if dataset.cards_json.exists():
+        for card in read_cards_for_dataset(dataset):
+            for audio in card.cherokee_audio:
+                if audio and Path(audio).exists():
+                    yield LibraryAudio(
+                        cherokee=MINIFIED(card.cherokee),
+                        file=Path(audio),
+                        dataset=dataset.collection_id,
+                    )
+
+    if dataset.annotations.exists():
+        for annotation in cherokee_annotations(dataset):
+            split_audio_path = annotation.split_audio_path(dataset)
+            if split_audio_path.exists():
+                yield LibraryAudio(
+                    cherokee=MINIFIED(annotation.annotation_text),
+                    file=split_audio_path,
+                    dataset=dataset.collection_id,
+                )
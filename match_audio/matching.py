@@ -1,16 +1,23 @@
 """
 Python module for matching Cherokee phonetics against annotations from ELAN
 """
+from collections import defaultdict
 from dataclasses import dataclass
+import heapq
+import itertools
 from pathlib import Path
-import re
-from typing import List
-from pydub import AudioSegment
-from pydub.effects import normalize
+from typing import Dict, List, Set, Tuple, Union
 
+import numpy as np
 
+from common.phonetics import MINIFIED
 from common.structs import DatasetMetadata
-from common.annotations import Annotation, cherokee_annotations
+from common.annotations import (
+    cherokee_annotations,
+    ensure_split_audio_exists_for_annotations,
+)
+
+from .rescoring import EDIT_WEIGHT, RESCORE_POOL, edit_similarities
 
 
 @dataclass
@@ -18,22 +25,23 @@ class MatchableAudio:
     cherokee: str  # phonetics, without tones
     file: Path
 
-    @staticmethod
-    def from_annotation(
-        dataset: DatasetMetadata, audio_source: AudioSegment, annotation: Annotation
-    ):
-        annotation.ensure_split_audio_exists(dataset, audio_source)
-        return MatchableAudio(
-            annotation.annotation_text, file=annotation.split_audio_path(dataset)
-        )
-
 
-def get_matchable_audio_from_annotations(
-    dataset: DatasetMetadata, audio_source: AudioSegment
-):
-    return [
-        MatchableAudio.from_annotation(dataset, audio_source, annotation)
+def get_matchable_audio_from_annotations(dataset: DatasetMetadata, jobs: int = 1):
+    """
+    Audio of every transcribed Cherokee annotation. Untranscribed ones (eg. straight
+    from `segment_audio`) have nothing to match against, so aren't offered.
+    """
+    annotations = [
+        annotation
         for annotation in cherokee_annotations(dataset)
+        if annotation.annotation_text.strip() != ""
+    ]
+    split_audio_paths = ensure_split_audio_exists_for_annotations(
+        dataset, annotations, jobs=jobs
+    )
+    return [
+        MatchableAudio(annotation.annotation_text, file=split_audio_path)
+        for annotation, split_audio_path in zip(annotations, split_audio_paths)
     ]
 
 
@@ -47,22 +55,84 @@ def trigram_similarity(a, b):
 
 
 def minify_pronounce(rich: str):
-    return (
-        re.sub(
-            r"[\:ɂ¹²³⁴]|(.,)",  # JW uses commas for drop-vowels
-            "",
-            rich,
-        )
-    ).lower()
+    return MINIFIED(rich)
+
+
+Trigram = Tuple[str, str, str]
+
+
+class MatchIndex:
+    """
+    Inverted trigram index over the available audio, built once and then queried for
+    each term.
+
+    Queries rank candidates by the same trigram Jaccard similarity as
+    `trigram_similarity`, but only score candidates sharing at least one trigram with
+    the term.
+    """
+
+    def __init__(self, available_cherokee_audio: List[MatchableAudio]):
+        self.audio = list(available_cherokee_audio)
+        self.trigram_sets: List[Set[Trigram]] = [
+            set(trigrams(audio.cherokee.lower())) for audio in self.audio
+        ]
+        self.postings: Dict[Trigram, List[int]] = defaultdict(list)
+        for i, trigram_set in enumerate(self.trigram_sets):
+            for trigram in trigram_set:
+                self.postings[trigram].append(i)
+
+    def scores(self, target_cherokee: str) -> Dict[int, float]:
+        """Similarity of every candidate sharing a trigram with the target, by index."""
+        query: Set[Trigram] = set(trigrams(minify_pronounce(target_cherokee.lower())))
+        shared: Dict[int, int] = defaultdict(int)
+        for trigram in query:
+            for i in self.postings.get(trigram, ()):
+                shared[i] += 1
+        return {
+            i: n / (len(query) + len(self.trigram_sets[i]) - n)
+            for i, n in shared.items()
+        }
+
+    def _best(self, scores: Dict[int, float], n: int) -> List[int]:
+        # ties keep their original order, as with a stable sort
+        best = heapq.nsmallest(n, scores, key=lambda i: (-scores[i], i))
+        if len(best) < n:
+            # everything else scores 0
+            best.extend(
+                itertools.islice(
+                    (i for i in range(len(self.audio)) if i not in scores),
+                    n - len(best),
+                )
+            )
+        return best
+
+    def top_n(
+        self, target_cherokee: str, n: int, rescore: bool = False
+    ) -> List[MatchableAudio]:
+        """
+        The `n` most similar candidates. With `rescore`, the best `RESCORE_POOL` by
+        trigram similarity are re-ranked by trigram similarity and weighted edit
+        distance together.
+        """
+        scores = self.scores(target_cherokee)
+        if not rescore:
+            return [self.audio[i] for i in self._best(scores, n)]
+
+        pool = self._best(scores, max(n, RESCORE_POOL))
+        similarities = EDIT_WEIGHT * edit_similarities(
+            target_cherokee, [self.audio[i].cherokee for i in pool]
+        ) + (1 - EDIT_WEIGHT) * np.array([scores.get(i, 0.0) for i in pool])
+        # stable, so trigram order breaks ties
+        reranked = sorted(range(len(pool)), key=lambda p: -similarities[p])
+        return [self.audio[pool[p]] for p in reranked[:n]]
 
 
 def top_n_matches(
-    target_cherokee: str, available_cherokee_audio: List[MatchableAudio], n: int
+    target_cherokee: str,
+    available_cherokee_audio: Union[MatchIndex, List[MatchableAudio]],
+    n: int,
+    rescore: bool = False,
 ) -> List[MatchableAudio]:
-    return sorted(
-        available_cherokee_audio,
-        key=lambda match: trigram_similarity(
-            minify_pronounce(target_cherokee.lower()), match.cherokee.lower()
-        ),
-        reverse=True,
-    )[:n]
+    if not isinstance(available_cherokee_audio, MatchIndex):
+        available_cherokee_audio = MatchIndex(available_cherokee_audio)
+    return available_cherokee_audio.top_n(target_cherokee, n, rescore=rescore)
@@ -0,0 +1,79 @@
+"""
+Python module for previewing candidate audio during interactive matching without
+blocking the prompt.
+"""
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Iterable
+
+from pydub import AudioSegment
+from pydub.playback import play
+
+PREVIEW_CACHE_SIZE = 32
+"""Number of decoded clips kept in memory."""
+
+PREVIEW_WORKERS = 2
+
+
+class PreviewEngine:
+    """
+    Decodes candidate clips on a small thread pool ahead of time and plays them in
+    the background.
+
+    Decoded clips (or in-flight decodes) are kept in a bounded LRU keyed by path, so
+    asking for a clip that is already being prefetched waits on that decode instead
+    of starting another. Playback goes through a single worker so previews play one
+    after another rather than on top of each other.
+    """
+
+    def __init__(
+        self, workers: int = PREVIEW_WORKERS, cache_size: int = PREVIEW_CACHE_SIZE
+    ):
+        self.cache_size = cache_size
+        self._decoded: "OrderedDict[Path, Future[AudioSegment]]" = OrderedDict()
+        self._decoders = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="preview-decode"
+        )
+        self._player = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="preview-play"
+        )
+
+    def _decode(self, file: Path) -> "Future[AudioSegment]":
+        decoded = self._decoded.get(file)
+        if decoded is not None:
+            self._decoded.move_to_end(file)
+            return decoded
+        decoded = self._decoders.submit(AudioSegment.from_file, file)
+        self._decoded[file] = decoded
+        while len(self._decoded) > self.cache_size:
+            self._decoded.popitem(last=False)
+        return decoded
+
+    def prefetch(self, files: Iterable[Path]):
+        """Start decoding `files` (most important first) if they aren't cached."""
+        for file in files:
+            self._decode(Path(file))
+
+    def play(self, file: Path) -> "Future[None]":
+        """Queue `file` to play once decoded; returns immediately."""
+        decoded = self._decode(Path(file))
+        return self._player.submit(self._play_decoded, file, decoded)
+
+    @staticmethod
+    def _play_decoded(file: Path, decoded: "Future[AudioSegment]"):
+        try:
+            play(decoded.result())
+        except Exception as e:
+            print(f"\nCouldn't play {file}: {e}")
+
+    def close(self):
+        """Stop decoding and drop queued previews; used on leaving a `with` block."""
+        self._decoders.shutdown(wait=False, cancel_futures=True)
+        self._player.shutdown(wait=False, cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
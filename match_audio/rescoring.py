@@ -0,0 +1,111 @@
+"""
+Python module for re-ranking trigram matches with a weighted edit distance.
+
+Trigram similarity says little about short words (a two syllable word has only a
+handful of trigrams) and can't separate near-duplicates, so the best trigram
+candidates are re-ranked by how many edits it takes to turn the term into each one,
+together with their trigram similarity. Edits that barely change the sound, like d
+for t or a dropped tone or length mark, are cheap, so the term is compared with its
+marks rather than minified.
+"""
+from typing import Dict, FrozenSet, List, Sequence
+
+import numpy as np
+
+from common.phonetics import SPOKEN
+
+RESCORE_POOL = 20
+"""How many of the best trigram candidates are re-ranked."""
+
+EDIT_WEIGHT = 0.5
+"""Share of a re-ranked candidate's score from edit distance; the rest is trigrams."""
+
+SIMILAR_SOUNDS: Dict[FrozenSet[str], float] = {
+    frozenset("dt"): 0.3,
+    frozenset("gk"): 0.3,
+}
+"""Substitution costs for pairs of letters speakers and transcribers mix up."""
+
+MARKS = set("¹²³⁴:ɂ")
+"""Tone, length and glottal stop marks, which are cheap to add or drop."""
+
+MARK_COST = 0.1
+
+
+def _substitution_cost(a: str, b: str) -> float:
+    if a == b:
+        return 0.0
+    return SIMILAR_SOUNDS.get(frozenset((a, b)), 1.0)
+
+
+def _indel_cost(a: str) -> float:
+    return MARK_COST if a in MARKS else 1.0
+
+
+def weighted_edit_distances(query: str, candidates: Sequence[str]) -> np.ndarray:
+    """
+    Weighted Levenshtein distance from `query` to every candidate.
+
+    The usual dynamic program, but with a row per candidate so each step works on all
+    of them at once: there's one loop iteration per letter of the query, and none per
+    candidate or candidate letter. Insertions along a row are resolved with a running
+    minimum rather than a loop.
+    """
+    alphabet = sorted(set(query).union(*candidates))
+    codes = {letter: i for i, letter in enumerate(alphabet)}
+    substitution = np.array(
+        [[_substitution_cost(a, b) for b in alphabet] for a in alphabet]
+    )
+    indel = np.array([_indel_cost(a) for a in alphabet])
+
+    lengths = np.array([len(c) for c in candidates], dtype=np.int64)
+    width = int(lengths.max(initial=0))
+    letters = np.zeros((len(candidates), width), dtype=np.int64)
+    for row, candidate in enumerate(candidates):
+        letters[row, : len(candidate)] = [codes[letter] for letter in candidate]
+
+    # cost of inserting each candidate's first j letters (padding is never read)
+    insertions = np.zeros((len(candidates), width + 1))
+    insertions[:, 1:] = np.cumsum(indel[letters], axis=1)
+
+    distances = insertions.copy()
+    for letter in query:
+        code = codes[letter]
+        previous = distances
+        distances = np.empty_like(previous)
+        distances[:, 0] = previous[:, 0] + indel[code]
+        distances[:, 1:] = np.minimum(
+            previous[:, :-1] + substitution[code][letters],  # substitute (or keep)
+            previous[:, 1:] + indel[code],  # delete the query letter
+        )
+        # insert candidate letters: d[j] = min over i <= j of d[i] + cost(i+1..j)
+        distances = np.minimum.accumulate(distances - insertions, axis=1) + insertions
+
+    return distances[np.arange(len(candidates)), lengths]
+
+
+def _similarities(query: str, candidates: List[str]) -> np.ndarray:
+    distances = weighted_edit_distances(query, candidates)
+    longest = np.maximum(len(query), [len(candidate) for candidate in candidates])
+    return 1 - distances / np.maximum(longest, 1)
+
+
+def _sorted_words(text: str) -> str:
+    return " ".join(sorted(text.split()))
+
+
+def edit_similarities(target_cherokee: str, candidates: List[str]) -> np.ndarray:
+    """
+    1 - normalized weighted edit distance of each candidate to the target, in
+    whichever word order is closer, since annotations don't always keep the term's.
+    """
+    query = SPOKEN(target_cherokee)
+    candidates = SPOKEN.batch(candidates)
+    if len(candidates) == 0:
+        return np.zeros(0)
+    return np.maximum(
+        _similarities(query, candidates),
+        _similarities(
+            _sorted_words(query), [_sorted_words(candidate) for candidate in candidates]
+        ),
+    )
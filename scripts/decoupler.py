@@ -1,11 +1,14 @@
 """
 Utility for converting folder structure to album metadata for the Decoupled app.
+
+Run from the repository root with `python -m scripts.decoupler`.
 """
 
 import argparse
 from pathlib import Path
 from pydub import AudioSegment
-from pydub.effects import normalize
+
+from common.normalization import normalize
 
 
 def album_name_from_path(file_path: Path):
@@ -1,3 +1,8 @@
+"""
+Collects example sentences for each verb in the dictionary CSV into `dict_verbs.json`.
+
+Run from the repository root with `python -m scripts.make_json_dict`.
+"""
 import csv
 import json
 from dataclasses import asdict, dataclass
@@ -6,16 +11,11 @@ import traceback
 from typing import Dict, List, Tuple
 import unicodedata
 
+from common.phonetics import CANONICAL
+
 
 def normalize_phonetics(cherokee: str):
-    return (
-        cherokee.lower()
-        # .replace("j", "ts")
-        # .replace("qu", "gw")
-        .replace("Ɂ", "ɂ")
-        .replace("ʔ", "ɂ")
-        .replace("ː", ":")
-    )
+    return CANONICAL(cherokee)
 
 
 def clean_field(field: str) -> str:
@@ -1,17 +1,20 @@
+"""
+Converts the verb tables in `handbook-verbs.txt` to `handbook-verbs.csv` and
+`handbook-verbs.json`, in JW's spelling.
+
+Run from the repository root with `python -m scripts.parse_handbook`.
+"""
 from csv import DictWriter
 import json
 import re
 from typing import Dict
 import unicodedata
 
+from common.phonetics import HANDBOOK_TO_JW
+
 
 def convert_consonants(phonetics: str) -> str:
-    return (
-        phonetics.replace("t", "d")
-        .replace("dh", "t")
-        .replace("k", "g")
-        .replace("gh", "k")
-    )
+    return HANDBOOK_TO_JW(phonetics)
 
 
 def convert_tones(source: str):
@@ -1,3 +1,9 @@
+"""
+Finds dictionary words with similar spellings and writes word lists for a wordle
+style game to `wordle_words.json`.
+
+Run from the repository root with `python -m scripts.similar_words`.
+"""
 import csv
 import json
 from dataclasses import dataclass
@@ -7,16 +13,11 @@ from fuzzy_match import match
 from rich import print
 import readline
 
+from common.phonetics import FOLDED_SPELLING
+
 
 def normalize(cherokee: str):
-    return (
-        cherokee.lower()
-        .replace("j", "ts")
-        .replace("qu", "gw")
-        .replace("Ɂ", "ɂ")
-        .replace("ʔ", "ɂ")
-        .replace("ː", ":")
-    )
+    return FOLDED_SPELLING(cherokee)
 
 
 @dataclass
@@ -0,0 +1,77 @@
+import argparse
+from pathlib import Path
+from typing import Optional
+
+from common.annotations import open_audio_source, write_annotations_tsv
+from common.structs import DatasetMetadata
+
+from .segmentation import SegmentationSettings, auto_segment
+
+
+def main(dataset_folder: Path, output: Optional[Path], settings: SegmentationSettings):
+    dataset = DatasetMetadata.from_file(dataset_folder / "dataset.json")
+    output = output or dataset.auto_annotations
+
+    with open_audio_source(dataset.audio_source) as audio_source:
+        annotations = list(auto_segment(audio_source, settings))
+
+    write_annotations_tsv(output, annotations)
+    print(
+        f"Wrote {len(annotations)} candidate annotations to {output}; "
+        "import them into ELAN to transcribe them"
+    )
+
+
+if __name__ == "__main__":
+    defaults = SegmentationSettings()
+    parser = argparse.ArgumentParser(
+        "segment_audio",
+        description="Find candidate annotations in a dataset's source audio by detecting silence",
+    )
+    parser.add_argument(
+        "dataset_folder",
+        type=str,
+        help="Path to folder containing dataset, eg. `data/jw-living-phrases`",
+    )
+    parser.add_argument(
+        "--output",
+        type=str,
+        default=None,
+        help="Where to write the annotation TSV (default: auto_annotations.txt in the dataset folder).",
+    )
+    parser.add_argument(
+        "--threshold-db",
+        type=float,
+        default=defaults.threshold_db,
+        help="How far above the noise floor audio must be to count as speech.",
+    )
+    parser.add_argument(
+        "--min-silence-ms",
+        type=int,
+        default=defaults.min_silence_ms,
+        help="Pauses shorter than this don't split a segment.",
+    )
+    parser.add_argument(
+        "--min-segment-ms",
+        type=int,
+        default=defaults.min_segment_ms,
+        help="Segments shorter than this are dropped.",
+    )
+    parser.add_argument(
+        "--padding-ms",
+        type=int,
+        default=defaults.padding_ms,
+        help="Silence to keep either side of each segment.",
+    )
+
+    args = parser.parse_args()
+    main(
+        dataset_folder=Path(args.dataset_folder),
+        output=None if args.output is None else Path(args.output),
+        settings=SegmentationSettings(
+            threshold_db=args.threshold_db,
+            min_silence_ms=args.min_silence_ms,
+            min_segment_ms=args.min_segment_ms,
+            padding_ms=args.padding_ms,
+        ),
+    )
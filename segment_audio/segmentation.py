@@ -0,0 +1,132 @@
+"""
+Python module for finding candidate annotations in a source recording by looking for
+stretches of speech between silences.
+"""
+from dataclasses import dataclass
+from typing import Iterator, List, Tuple
+
+import numpy as np
+
+from common.annotations import Annotation, AudioSourceReader
+from common.normalization import samples_from_segment
+
+AUTO_TIER = "auto"
+
+
+@dataclass
+class SegmentationSettings:
+    frame_ms: int = 20
+    """Length of each analysis frame."""
+
+    threshold_db: float = 15.0
+    """How far above the noise floor a frame must be to count as speech."""
+
+    min_silence_ms: int = 300
+    """Pauses shorter than this don't split a segment."""
+
+    min_segment_ms: int = 150
+    """Segments shorter than this are dropped as clicks or breaths."""
+
+    padding_ms: int = 100
+    """Silence kept either side of each segment (never overlapping a neighbour)."""
+
+    chunk_ms: int = 60_000
+    """How much audio is read at once, which bounds memory use."""
+
+
+def frame_energies_db(
+    audio_source: AudioSourceReader, settings: SegmentationSettings
+) -> Tuple[np.ndarray, float]:
+    """
+    RMS energy (dBFS) of every frame in the recording, and the frame length in ms.
+
+    The recording is read a chunk at a time; samples left over at the end of a chunk
+    are carried into the next so frames line up exactly.
+    """
+    energies: List[np.ndarray] = []
+    carry = np.zeros(0)
+    frame_len = None
+    frame_rate = None
+    full_scale = None
+
+    for start_ms in range(0, audio_source.duration_ms, settings.chunk_ms):
+        chunk = audio_source.segment(start_ms, start_ms + settings.chunk_ms)
+        if frame_len is None:
+            frame_rate = chunk.frame_rate
+            frame_len = max(1, int(chunk.frame_rate * settings.frame_ms / 1000))
+            full_scale = float(2 ** (chunk.sample_width * 8 - 1))
+
+        mono = (
+            samples_from_segment(chunk)
+            .reshape(-1, chunk.channels)
+            .astype(np.float64)
+            .mean(axis=1)
+        )
+        buffer = np.concatenate([carry, mono])
+        n_frames = len(buffer) // frame_len
+        frames = buffer[: n_frames * frame_len].reshape(n_frames, frame_len)
+        carry = buffer[n_frames * frame_len :]
+
+        rms = np.sqrt((frames**2).mean(axis=1)) / full_scale
+        with np.errstate(divide="ignore"):
+            energies.append(20 * np.log10(rms))
+
+    if frame_len is None:
+        return np.zeros(0), float(settings.frame_ms)
+    return np.concatenate(energies), 1000 * frame_len / frame_rate  # type: ignore
+
+
+def find_segments(
+    energies_db: np.ndarray, frame_ms: float, settings: SegmentationSettings
+) -> Iterator[Tuple[int, int]]:
+    """(start_ms, end_ms) of each stretch of speech, given per-frame energies."""
+    finite = energies_db[np.isfinite(energies_db)]
+    if len(finite) == 0:
+        return
+
+    noise_floor = np.percentile(finite, 10)
+    voiced = (energies_db > noise_floor + settings.threshold_db).astype(np.int8)
+
+    # frame indices where runs of voiced frames start and stop (exclusive)
+    edges = np.diff(np.concatenate([[0], voiced, [0]]))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    if len(starts) == 0:
+        return
+
+    # merge runs separated by short pauses
+    min_silence_frames = settings.min_silence_ms / frame_ms
+    split_after = np.flatnonzero(starts[1:] - ends[:-1] >= min_silence_frames)
+    starts = starts[np.concatenate([[0], split_after + 1])]
+    ends = ends[np.concatenate([split_after, [len(ends) - 1]])]
+
+    keep = (ends - starts) * frame_ms >= settings.min_segment_ms
+    starts_ms = starts[keep] * frame_ms
+    ends_ms = ends[keep] * frame_ms
+    if len(starts_ms) == 0:
+        return
+
+    # pad, but never past the recording or halfway into the gap to a neighbour
+    midpoints = (starts_ms[1:] + ends_ms[:-1]) / 2
+    lower = np.concatenate([[0], midpoints])
+    upper = np.concatenate([midpoints, [len(energies_db) * frame_ms]])
+    padded_starts = np.maximum(starts_ms - settings.padding_ms, lower)
+    padded_ends = np.minimum(ends_ms + settings.padding_ms, upper)
+
+    for start_ms, end_ms in zip(padded_starts, padded_ends):
+        yield int(round(start_ms)), int(round(end_ms))
+
+
+def auto_segment(
+    audio_source: AudioSourceReader, settings: SegmentationSettings
+) -> Iterator[Annotation]:
+    """Candidate annotations (with empty text) for every stretch of speech."""
+    energies_db, frame_ms = frame_energies_db(audio_source, settings)
+    for start_ms, end_ms in find_segments(energies_db, frame_ms, settings):
+        yield Annotation(
+            tier=AUTO_TIER,
+            start_ms=start_ms,
+            end_ms=end_ms,
+            duration_ms=end_ms - start_ms,
+            annotation_text="",
+        )